@@ -0,0 +1,272 @@
+# Headless HTTP API over the same core the Streamlit app uses. Run it with several
+# worker processes, e.g. `python api.py` or `uvicorn api:app --workers 4`, keeping
+# API_WORKERS (default 4) equal to the worker count.
+# Caches, job queues and rate limiters are per worker, so each worker gets
+# 1/API_WORKERS of every provider quota; the chat, news, image and price stores
+# live on disk and are shared by every worker on the host.
+# Requests without key headers spend the server's own provider keys, so it only
+# listens on localhost unless API_HOST says otherwise
+import asyncio
+import json
+import os
+import uuid
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import uvicorn
+from core import (
+    CHAT_CACHE_MIN_THRESHOLD, CRYPTO_CHART_RANGES, STOCK_CHART_RANGES, VIDEO_RESOLUTIONS,
+    NewsSearch, ProviderError, answer_chat, build_watchlist_table, crypto_range_start,
+    downsample_bars, fetch_crypto_rate, fetch_stock_profile, fetch_stock_quote, get_chat_store,
+    get_image_jobs, get_image_store, get_indicators, image_payload, load_crypto_history,
+    load_stock_history, message_tokens, parse_symbols, pick_rendition, remember_crypto_quote,
+    remember_stock_quote, search_videos, stock_range_start, submit_image
+)
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8000"))
+API_WORKERS = int(os.environ.get("API_WORKERS", "4"))
+os.environ.setdefault("RATE_LIMIT_PROCESSES", str(API_WORKERS))
+
+app = FastAPI(title="Multi-Purpose AI Assistant API")
+
+# Provider API keys come from request headers, falling back to the server's environment
+PROVIDER_KEYS = {
+    "openai": ("x-openai-key", "OPENAI_API_KEY"),
+    "together": ("x-together-key", "TOGETHER_API_KEY"),
+    "pexels": ("x-pexels-key", "PEXELS_API_KEY"),
+    "finnhub": ("x-finnhub-key", "FINNHUB_API_KEY"),
+    "twelve": ("x-twelve-key", "TWELVE_API_KEY"),
+    "coinapi": ("x-coinapi-key", "COINAPI_API_KEY"),
+    "news": ("x-news-key", "NEWS_API_KEY"),
+}
+
+def provider_key(request, provider, required=True):
+    header, env = PROVIDER_KEYS[provider]
+    key = request.headers.get(header) or os.environ.get(env)
+    if not key and required:
+        raise HTTPException(401, f"Missing {provider} API key: send the {header} header or set {env}")
+    return key
+
+# Upstream failures keep their status when it means something to the caller
+@app.exception_handler(ProviderError)
+async def provider_error(request, e):
+    status_code = e.status_code if e.status_code in (401, 403, 404, 429) else 502
+    return JSONResponse({"error": str(e), "upstream_status": e.status_code}, status_code=status_code)
+
+# OHLCV bars (and indicators) as JSON records, NaN as null
+def bar_records(frame):
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+# Chat: the answer streams as server-sent events, and both turns are stored under
+# the conversation id so later requests continue the same conversation
+class ChatRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None
+    max_messages: int = Field(50, ge=1, le=100)
+    token_budget: int = Field(8000, ge=1000, le=32000)
+    ground: bool = False
+    cache_threshold: Optional[float] = Field(None, ge=CHAT_CACHE_MIN_THRESHOLD, le=1.0)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat")
+async def chat(body: ChatRequest, request: Request):
+    api_key = provider_key(request, "openai")
+    conversation_id = body.conversation_id or uuid.uuid4().hex
+    store = get_chat_store()
+    history = await asyncio.to_thread(store.recent, conversation_id, max(body.max_messages - 1, 0))
+    message = {"role": "user", "content": body.message}
+    message_tokens(message)
+    await asyncio.to_thread(store.append, conversation_id, message)
+    history.append(message)
+    
+    # Grounding only draws on data fetched with the caller's own provider keys
+    retrieval_keys = [provider_key(request, p, required=False) for p in ("news", "finnhub", "coinapi")] if body.ground else None
+    try:
+        deltas, dropped = await asyncio.to_thread(
+            answer_chat, api_key, history, body.token_budget, retrieval_keys, body.cache_threshold)
+    except Exception as e:
+        raise HTTPException(502, f"Error generating response: {str(e)}")
+    
+    def events():
+        parts = []
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                yield sse("delta", {"text": delta})
+        except Exception as e:
+            yield sse("error", {"error": f"Error generating response: {str(e)}"})
+            return
+        answer = {"role": "assistant", "content": "".join(parts)}
+        message_tokens(answer)
+        store.append(conversation_id, answer)
+        yield sse("done", {"conversation_id": conversation_id, "dropped": dropped})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Conversation-Id": conversation_id}
+    )
+
+@app.get("/chat/{conversation_id}")
+async def chat_history(conversation_id: str, limit: int = Query(20, ge=1, le=100)):
+    store = get_chat_store()
+    messages = await asyncio.to_thread(store.recent, conversation_id, limit)
+    total = await asyncio.to_thread(store.count, conversation_id)
+    return {"conversation_id": conversation_id, "messages": messages, "total": total}
+
+# Images: generation is queued and polled, like the app's job panel. Bounds match
+# the app's settings, so one request can't queue an unbounded number of jobs
+class ImageRequest(BaseModel):
+    prompt: str
+    width: int = Field(1024, ge=256, le=1024)
+    height: int = Field(1024, ge=256, le=1024)
+    steps: int = Field(30, ge=10, le=50)
+    seed: int = Field(0, ge=0, le=2**31 - 1)
+    variants: int = Field(1, ge=1, le=4)
+
+@app.post("/images", status_code=202)
+async def create_images(body: ImageRequest, request: Request):
+    api_key = provider_key(request, "together")
+    if not body.prompt.strip():
+        raise HTTPException(400, "Please enter an image prompt")
+    jobs = []
+    for variant in range(body.variants):
+        payload = image_payload(body.prompt, body.width, body.height, body.steps, body.seed + variant)
+        jobs.append(await asyncio.to_thread(submit_image, api_key, payload))
+    return {"jobs": jobs}
+
+# Jobs queued on another worker are only visible here once their image is stored
+def image_job_status(job_id):
+    job = get_image_jobs().get(job_id)
+    if job is not None:
+        return {"id": job.id, "status": job.status, "prompt": job.prompt, "seed": job.seed,
+                "digest": job.digest, "error": job.error}
+    digest = get_image_store().resolve(job_id)
+    if digest is None:
+        raise HTTPException(404, "Unknown or unfinished image job")
+    return {"id": job_id, "status": "done", "digest": digest}
+
+@app.get("/images/{job_id}")
+async def image_status(job_id: str):
+    return await asyncio.to_thread(image_job_status, job_id)
+
+@app.get("/images/{job_id}/png")
+async def image_file(job_id: str, thumbnail: bool = False):
+    status = await asyncio.to_thread(image_job_status, job_id)
+    if status["status"] != "done":
+        raise HTTPException(409, f"Image job is {status['status']}")
+    store = get_image_store()
+    path = store.thumbnail_path(status["digest"]) if thumbnail else store.path(status["digest"])
+    if not os.path.exists(path):
+        raise HTTPException(410, "The image has expired from the image store")
+    return FileResponse(path, media_type="image/png")
+
+@app.get("/videos")
+async def videos(request: Request, query: str, page: int = 1, max_resolution: str = "720p"):
+    api_key = provider_key(request, "pexels")
+    if max_resolution not in VIDEO_RESOLUTIONS:
+        raise HTTPException(400, f"max_resolution must be one of {', '.join(VIDEO_RESOLUTIONS)}")
+    cards, has_more = await asyncio.to_thread(search_videos, api_key, query, page)
+    return {
+        "videos": [
+            {"id": card["id"], "image": card["image"], "caption": card["caption"],
+             "link": pick_rendition(card, VIDEO_RESOLUTIONS[max_resolution])}
+            for card in cards
+        ],
+        "has_more": has_more
+    }
+
+# Quotes and price history
+@app.get("/stocks/{symbol}/quote")
+async def stock_quote(symbol: str, request: Request):
+    api_key = provider_key(request, "finnhub")
+    profile, quote = await asyncio.gather(
+        asyncio.to_thread(fetch_stock_profile, api_key, symbol),
+        asyncio.to_thread(fetch_stock_quote, api_key, symbol)
+    )
+    await asyncio.to_thread(remember_stock_quote, api_key, symbol, profile, quote)
+    return {"symbol": symbol, "profile": profile, "quote": quote}
+
+@app.get("/crypto/{symbol}/quote")
+async def crypto_quote(symbol: str, request: Request):
+    api_key = provider_key(request, "coinapi")
+    rate = await asyncio.to_thread(fetch_crypto_rate, api_key, symbol)
+    await asyncio.to_thread(remember_crypto_quote, api_key, symbol, rate)
+    return {"symbol": symbol, "rate": rate}
+
+# Bars inside the range, optionally with indicators and downsampled to chart size
+def price_range(source, symbol, interval, history, start, indicators, downsample):
+    result = {"symbol": symbol, "interval": interval, "bars": []}
+    # A symbol upstream has no bars for yet has nothing to index or downsample
+    if history.empty:
+        if indicators:
+            result["indicators"] = []
+        return result
+    window = history["time"] >= start
+    bars = history[window]
+    ind = get_indicators(source, symbol, interval, history)[window] if indicators or downsample else None
+    if downsample:
+        bars, ind = downsample_bars(bars, ind, "Candlestick")
+    result["bars"] = bar_records(bars)
+    if indicators:
+        result["indicators"] = bar_records(ind)
+    return result
+
+@app.get("/stocks/{symbol}/history")
+async def stock_history(symbol: str, request: Request, chart_range: str = Query("1Y", alias="range"), indicators: bool = False, downsample: bool = False):
+    api_key = provider_key(request, "twelve")
+    if chart_range not in STOCK_CHART_RANGES:
+        raise HTTPException(400, f"range must be one of {', '.join(STOCK_CHART_RANGES)}")
+    interval = STOCK_CHART_RANGES[chart_range][0]
+    history = await asyncio.to_thread(load_stock_history, api_key, symbol, interval)
+    return await asyncio.to_thread(
+        price_range, "twelve", symbol, interval, history, stock_range_start(chart_range), indicators, downsample)
+
+@app.get("/crypto/{symbol}/history")
+async def crypto_history(symbol: str, request: Request, chart_range: str = Query("30D", alias="range"), indicators: bool = False, downsample: bool = False):
+    api_key = provider_key(request, "coinapi")
+    if chart_range not in CRYPTO_CHART_RANGES:
+        raise HTTPException(400, f"range must be one of {', '.join(CRYPTO_CHART_RANGES)}")
+    interval = CRYPTO_CHART_RANGES[chart_range][0]
+    history = await asyncio.to_thread(load_crypto_history, api_key, symbol, interval)
+    return await asyncio.to_thread(
+        price_range, "coinapi", symbol, interval, history, crypto_range_start(chart_range), indicators, downsample)
+
+# Each symbol costs several rate-limited upstream calls
+WATCHLIST_MAX_SYMBOLS = 100
+
+@app.get("/watchlist")
+async def watchlist(request: Request, stocks: str = "", crypto: str = ""):
+    stock_symbols = parse_symbols(stocks)
+    crypto_symbols = parse_symbols(crypto)
+    if len(stock_symbols) + len(crypto_symbols) > WATCHLIST_MAX_SYMBOLS:
+        raise HTTPException(422, f"A watchlist can hold at most {WATCHLIST_MAX_SYMBOLS} symbols")
+    keys = {
+        "finnhub": provider_key(request, "finnhub", required=bool(stock_symbols)),
+        "twelve": provider_key(request, "twelve", required=bool(stock_symbols)),
+        "coinapi": provider_key(request, "coinapi", required=bool(crypto_symbols))
+    }
+    df, failed = await asyncio.to_thread(build_watchlist_table, keys, stock_symbols, crypto_symbols)
+    return {"rows": json.loads(df.to_json(orient="records")), "failed": failed}
+
+@app.get("/news")
+async def news(request: Request, query: str, days: Optional[int] = Query(None, ge=1, le=30), sort: str = "relevance", offset: int = Query(0, ge=0, le=100), limit: int = Query(5, ge=1, le=20)):
+    api_key = provider_key(request, "news")
+    
+    def page():
+        search = NewsSearch(query, days, sort == "newest")
+        search.shown = offset
+        articles = search.next_page(api_key, limit)
+        return {"articles": articles, "has_more": search.has_more, "error": search.error}
+    return await asyncio.to_thread(page)
+
+if __name__ == "__main__":
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
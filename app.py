@@ -1,16 +1,36 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
 import openai
-import requests
-import json
 import pandas as pd
-import datetime
+import numpy as np
 import time
+from concurrent.futures import as_completed
 from PIL import Image
 import io
-import base64
-import plotly.express as px
+import os
+import uuid
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from streamlit.errors import StreamlitAPIException
+from core import (
+    CHAT_CACHE_MIN_THRESHOLD, CRYPTO_CHART_RANGES, LIVE_RING_SIZE, LIVE_SOURCES, STOCK_CHART_RANGES,
+    VIDEO_RESOLUTIONS, WATCHLIST_SPARKLINE_DAYS, NewsSearch, answer_chat, build_watchlist_table,
+    crypto_range_start, downsample_bars, fetch_crypto_rate, fetch_stock_profile, fetch_stock_quote,
+    fetch_video_to_cache, future_outcome, get_chat_store, get_image_jobs, get_image_store,
+    get_indicators, get_ticker_hub, image_payload, load_crypto_history, load_stock_history,
+    message_tokens, parse_symbols, pick_rendition, remember_crypto_quote, remember_stock_quote,
+    search_videos, stock_range_start, submit_fetch, submit_image
+)
+
+# Fragments rerun only the decorated tab or panel when one of its widgets changes,
+# leaving the CSS, sidebar and menu from the last full run in place. A widget event
+# can still land in a full-app run (e.g. when queued behind a sidebar change), where
+# Streamlit refuses a fragment-scoped rerun, so that case reruns the whole page
+def rerun_fragment():
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
 
 # Enhanced CSS styling for professional appearance
 def inject_custom_css():
@@ -133,26 +153,106 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
+# Conversation pages shown at a time; older messages load on request
+CHAT_PAGE_SIZE = 20
+
 # Initialize session state
 def init_session_state():
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    if "chat_visible" not in st.session_state:
+        st.session_state.chat_visible = CHAT_PAGE_SIZE
+    if "conversation_id" not in st.session_state:
+        # The conversation id lives in the URL so a reload or restart can resume it
+        st.session_state.conversation_id = st.query_params.get("conversation") or uuid.uuid4().hex
+        st.query_params["conversation"] = st.session_state.conversation_id
+        st.session_state.chat_history = get_chat_store().recent(st.session_state.conversation_id, CHAT_PAGE_SIZE)
     if "image_prompt" not in st.session_state:
         st.session_state.image_prompt = ""
     if "generated_image" not in st.session_state:
         st.session_state.generated_image = None
+    if "edited_image" not in st.session_state:
+        st.session_state.edited_image = None
+    if "image_jobs" not in st.session_state:
+        st.session_state.image_jobs = []
+    if "image_jobs_opened" not in st.session_state:
+        st.session_state.image_jobs_opened = set()
     if "pixels_query" not in st.session_state:
         st.session_state.pixels_query = ""
     if "pixels_results" not in st.session_state:
         st.session_state.pixels_results = []
+    if "pixels_page" not in st.session_state:
+        st.session_state.pixels_page = 0
+    if "pixels_has_more" not in st.session_state:
+        st.session_state.pixels_has_more = False
+    if "video_selected" not in st.session_state:
+        st.session_state.video_selected = None
+    if "video_download" not in st.session_state:
+        st.session_state.video_download = None
     if "stock_symbol" not in st.session_state:
         st.session_state.stock_symbol = "AAPL"
     if "crypto_symbol" not in st.session_state:
         st.session_state.crypto_symbol = "BTC"
+    # Last fetched symbol of each panel and its quote card data
+    if "stock_loaded" not in st.session_state:
+        st.session_state.stock_loaded = None
+        st.session_state.stock_card = None
+    if "crypto_loaded" not in st.session_state:
+        st.session_state.crypto_loaded = None
+        st.session_state.crypto_card = None
+    if "watchlist_stocks" not in st.session_state:
+        st.session_state.watchlist_stocks = "AAPL, MSFT, GOOGL, AMZN, NVDA"
+    if "watchlist_crypto" not in st.session_state:
+        st.session_state.watchlist_crypto = "BTC, ETH, SOL"
+    if "watchlist_table" not in st.session_state:
+        st.session_state.watchlist_table = None
+    if "live_symbols" not in st.session_state:
+        st.session_state.live_symbols = "AAPL, BINANCE:BTCUSDT"
+    if "live_running" not in st.session_state:
+        st.session_state.live_running = False
+    if "live_window" not in st.session_state:
+        st.session_state.live_window = None
+    if "live_error" not in st.session_state:
+        st.session_state.live_error = None
     if "news_query" not in st.session_state:
         st.session_state.news_query = "technology"
     if "news_results" not in st.session_state:
         st.session_state.news_results = []
+    if "news_search" not in st.session_state:
+        st.session_state.news_search = None
+
+# Record a message durably and in the session's bounded window
+def add_chat_message(role, content, max_messages):
+    message = {"role": role, "content": content}
+    message_tokens(message)
+    get_chat_store().append(st.session_state.conversation_id, message)
+    st.session_state.chat_history.append(message)
+    if len(st.session_state.chat_history) > max_messages:
+        st.session_state.chat_history = st.session_state.chat_history[-max_messages:]
+
+# Throttled rendering of streamed chat completions
+STREAM_FLUSH_INTERVAL = 0.05
+STREAM_FLUSH_CHARS = 200
+
+# Batch streamed deltas into placeholder updates; returns the full text and frames pushed
+def render_stream(placeholder, deltas, prefix):
+    parts = []
+    frames = 0
+    pending_chars = 0
+    last_flush = time.monotonic()
+    for delta in deltas:
+        parts.append(delta)
+        pending_chars += len(delta)
+        now = time.monotonic()
+        if pending_chars >= STREAM_FLUSH_CHARS or now - last_flush >= STREAM_FLUSH_INTERVAL:
+            placeholder.markdown(f"{prefix}{''.join(parts)} ▌")
+            frames += 1
+            pending_chars = 0
+            last_flush = now
+    
+    full_response = "".join(parts)
+    placeholder.markdown(f"{prefix}{full_response}")
+    return full_response, frames + 1
 
 # Chat Tab
 def chat_tab():
@@ -169,26 +269,50 @@ def chat_tab():
             st.markdown('</div>', unsafe_allow_html=True)
             return
     
+    store = get_chat_store()
+    
     # Chat history management
     with st.expander("Chat History Options", expanded=False):
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Clear Chat History"):
+                store.clear(st.session_state.conversation_id)
                 st.session_state.chat_history = []
+                st.session_state.chat_visible = CHAT_PAGE_SIZE
                 st.success("Chat history cleared!")
         with col2:
-            max_messages = st.slider("Max messages to keep:", 10, 100, 50, 10)
+            max_messages = st.slider("Max messages to keep in context:", 10, 100, 50, 10)
             if len(st.session_state.chat_history) > max_messages:
                 st.session_state.chat_history = st.session_state.chat_history[-max_messages:]
+            token_budget = st.slider("Context token budget:", 1000, 32000, 8000, 1000)
+        col1, col2 = st.columns(2)
+        with col1:
+            use_cache = st.checkbox("Reuse answers to repeated questions", value=False)
+        with col2:
+            cache_threshold = st.slider("Cache similarity threshold:", CHAT_CACHE_MIN_THRESHOLD, 1.00, 0.97, 0.01, disabled=not use_cache)
+        use_retrieval = st.checkbox("Ground answers in fetched news and market data", value=False)
+        if st.session_state.get("last_stream_frames"):
+            st.caption(f"Last response rendered in {st.session_state.last_stream_frames} frames")
     
-    # Display chat history
-    for message in st.session_state.chat_history:
+    # Display only the most recent page(s) of the conversation
+    total_messages = store.count(st.session_state.conversation_id)
+    if total_messages > st.session_state.chat_visible:
+        st.caption(f"{total_messages - st.session_state.chat_visible} older messages hidden")
+        if st.button("Load older messages"):
+            st.session_state.chat_visible += CHAT_PAGE_SIZE
+    
+    if st.session_state.chat_visible <= len(st.session_state.chat_history):
+        visible_messages = st.session_state.chat_history[-st.session_state.chat_visible:]
+    else:
+        visible_messages = store.recent(st.session_state.conversation_id, st.session_state.chat_visible)
+    
+    for message in visible_messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
     # User input
     if prompt := st.chat_input("Type your message here..."):
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
+        add_chat_message("user", prompt, max_messages)
         
         with st.chat_message("user"):
             st.markdown(f"You: {prompt}")
@@ -196,31 +320,91 @@ def chat_tab():
         # Generate AI response
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            full_response = ""
             
             try:
-                client = openai.OpenAI(api_key=st.session_state.openai_api_key)
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are Grok, created by xAI. Provide helpful and truthful answers."},
-                        *[{"role": m["role"], "content": m["content"]} for m in st.session_state.chat_history]
-                    ],
-                    stream=True
+                deltas, dropped = answer_chat(
+                    st.session_state.openai_api_key,
+                    st.session_state.chat_history,
+                    token_budget,
+                    retrieval_keys=[
+                        st.session_state.get("news_api_key"),
+                        st.session_state.get("finhub_api_key"),
+                        st.session_state.get("coinapi_api_key")
+                    ] if use_retrieval else None,
+                    cache_threshold=cache_threshold if use_cache else None
                 )
+                if dropped:
+                    st.caption(f"{dropped} older messages left out to fit the context budget")
                 
-                for chunk in response:
-                    if chunk.choices[0].delta.content:
-                        full_response += chunk.choices[0].delta.content
-                        message_placeholder.markdown(f"AI Assistant: {full_response} ▌")
-                
-                message_placeholder.markdown(f"AI Assistant: {full_response}")
-                st.session_state.chat_history.append({"role": "assistant", "content": full_response})
+                full_response, st.session_state.last_stream_frames = render_stream(
+                    message_placeholder, deltas, "AI Assistant: ")
+                add_chat_message("assistant", full_response, max_messages)
             
             except Exception as e:
                 st.error(f"Error generating response: {str(e)}")
 
+# Status of this session's jobs; finished images open automatically
+IMAGE_GRID_COLUMNS = 4
+
+def image_jobs_panel():
+    queue = get_image_jobs()
+    jobs = [job for job in map(queue.get, st.session_state.image_jobs) if job is not None]
+    st.session_state.image_jobs = [job.id for job in jobs]
+    
+    for job in jobs:
+        if job.status == "done" and job.id not in st.session_state.image_jobs_opened:
+            st.session_state.image_jobs_opened.add(job.id)
+            st.session_state.generated_image = job.digest
+    
+    st.subheader("Generation Jobs")
+    pending = [job for job in jobs if job.status in ("queued", "running")]
+    for job in pending:
+        st.info(f"{job.status.title()}: {job.prompt[:80]} (seed {job.seed})")
+    for job in jobs:
+        if job.status == "failed":
+            st.error(f"Error generating image: {job.error}")
+    if pending:
+        st.button("Refresh Status")
+    
+    # Thumbnail grid of finished images, newest first. The store is shared by all
+    # sessions, so a job's image may have been evicted while the job is still listed
+    store = get_image_store()
+    done = [job for job in reversed(jobs) if job.status == "done"]
+    for row in range(0, len(done), IMAGE_GRID_COLUMNS):
+        cols = st.columns(IMAGE_GRID_COLUMNS)
+        for col, job in zip(cols, done[row:row + IMAGE_GRID_COLUMNS]):
+            with col:
+                if not store.touch(job.digest):
+                    st.caption(f"{job.prompt[:60]} (seed {job.seed}): expired")
+                    continue
+                st.image(store.thumbnail_path(job.digest), use_container_width=True)
+                st.caption(f"{job.prompt[:60]} (seed {job.seed})")
+                if st.button("Open", key=f"open_job_{job.id}"):
+                    st.session_state.generated_image = job.digest
+
+# Decoded frames for editing, cached per image digest
+EDIT_PREVIEW_SIZE = (512, 512)
+
+@st.cache_resource(max_entries=8, ttl=600)
+def get_edit_frames(digest):
+    img = Image.open(get_image_store().path(digest)).convert("RGB")
+    full = np.asarray(img)
+    preview = img.copy()
+    preview.thumbnail(EDIT_PREVIEW_SIZE)
+    return {"full": full, "preview": np.asarray(preview)}
+
+# Brightness then contrast, matching PIL's ImageEnhance: contrast pivots
+# around the mean luminance of the brightened image
+def adjust_image(frame, brightness, contrast):
+    b = np.float32(1 + brightness / 100)
+    c = np.float32(1 + contrast / 100)
+    brightened = np.minimum(frame * b, 255)
+    mean = np.float32((brightened @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).mean())
+    out = brightened * c + mean * (1 - c)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
 # Image Generation Tab
+@st.fragment
 def image_generation_tab():
     st.header("🖼️ AI Image Generation")
     
@@ -248,6 +432,13 @@ def image_generation_tab():
             image_size = st.selectbox("Image Size", ["512x512", "1024x1024", "768x768"], index=1)
         with col2:
             steps = st.slider("Generation Steps", 10, 50, 30, 5)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            variants = st.slider("Variants per prompt", 1, 4, 1)
+        with col2:
+            seed = st.number_input("Seed", 0, 2**31 - 1, 0)
+        with col3:
+            batch_mode = st.checkbox("Batch mode (one prompt per line)")
     
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -261,51 +452,37 @@ def image_generation_tab():
     with col2:
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("Generate Image"):
-            if st.session_state.image_prompt:
-                with st.spinner("Generating image..."):
-                    try:
-                        headers = {
-                            "Authorization": f"Bearer {st.session_state.together_api_key}",
-                            "Content-Type": "application/json"
-                        }
-                        
-                        width, height = map(int, image_size.split('x'))
-                        payload = {
-                            "model": "stabilityai/stable-diffusion-xl-base-1.0",
-                            "prompt": st.session_state.image_prompt,
-                            "width": width,
-                            "height": height,
-                            "steps": steps,
-                            "n": 1
-                        }
-                        
-                        response = requests.post(
-                            "https://api.together.xyz/v1/images/generations",
-                            headers=headers,
-                            json=payload
-                        )
-                        
-                        if response.status_code == 200:
-                            image_data = response.json()
-                            if "data" in image_data and image_data["data"]:
-                                image_b64 = image_data["data"][0]["b64_json"]
-                                image_bytes = base64.b64decode(image_b64)
-                                st.session_state.generated_image = image_bytes
-                                st.success("Image generated successfully!")
-                            else:
-                                st.error("Image generation failed. Please try again.")
-                        else:
-                            st.error(f"API Error: {response.text}")
-                    
-                    except Exception as e:
-                        st.error(f"Error generating image: {str(e)}")
+            if st.session_state.image_prompt.strip():
+                if batch_mode:
+                    prompts = [line.strip() for line in st.session_state.image_prompt.splitlines() if line.strip()]
+                else:
+                    prompts = [st.session_state.image_prompt]
+                width, height = map(int, image_size.split('x'))
+                
+                # One job per (prompt, seed); identical requests reuse the existing job
+                for prompt in dict.fromkeys(prompts):
+                    for variant in range(variants):
+                        payload = image_payload(prompt, width, height, steps, int(seed) + variant)
+                        job_id = submit_image(st.session_state.together_api_key, payload)
+                        if job_id not in st.session_state.image_jobs:
+                            st.session_state.image_jobs.append(job_id)
+                st.success(f"Queued {len(dict.fromkeys(prompts)) * variants} image(s)!")
             else:
                 st.warning("Please enter an image prompt")
     
+    if st.session_state.image_jobs:
+        image_jobs_panel()
+    
+    store = get_image_store()
+    if st.session_state.generated_image and not store.touch(st.session_state.generated_image):
+        st.session_state.generated_image = None
+        st.warning("The selected image has expired from the image store.")
+    
     if st.session_state.generated_image:
-        st.image(st.session_state.generated_image, caption="Generated Image")
+        st.image(store.path(st.session_state.generated_image), caption="Generated Image")
         
-        # Image editing options
+        # Image editing options; edits are previewed on a downscaled copy and the
+        # original is never overwritten
         with st.expander("Edit Image", expanded=False):
             col1, col2 = st.columns(2)
             with col1:
@@ -313,25 +490,46 @@ def image_generation_tab():
             with col2:
                 contrast = st.slider("Contrast", -100, 100, 0)
             
-            if st.button("Apply Edits"):
-                img = Image.open(io.BytesIO(st.session_state.generated_image))
-                enhancer = ImageEnhance.Brightness(img)
-                img = enhancer.enhance(1 + brightness / 100)
-                enhancer = ImageEnhance.Contrast(img)
-                img = enhancer.enhance(1 + contrast / 100)
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='PNG')
-                st.session_state.generated_image = img_byte_arr.getvalue()
-                st.image(st.session_state.generated_image, caption="Edited Image")
+            if brightness or contrast:
+                frames = get_edit_frames(st.session_state.generated_image)
+                st.image(adjust_image(frames["preview"], brightness, contrast), caption="Edited Preview")
+                
+                edit = (st.session_state.generated_image, brightness, contrast)
+                if st.button("Export Edited Image"):
+                    edited = Image.fromarray(adjust_image(frames["full"], brightness, contrast))
+                    img_byte_arr = io.BytesIO()
+                    edited.save(img_byte_arr, format='PNG')
+                    st.session_state.edited_image = (edit, store.put(img_byte_arr.getvalue()))
+                
+                if st.session_state.edited_image and st.session_state.edited_image[0] == edit and store.touch(st.session_state.edited_image[1]):
+                    with open(store.path(st.session_state.edited_image[1]), "rb") as image_file:
+                        st.download_button(
+                            label="Download Edited Image",
+                            data=image_file,
+                            file_name="edited_image.png",
+                            mime="image/png"
+                        )
         
-        st.download_button(
-            label="Download Image",
-            data=st.session_state.generated_image,
-            file_name="generated_image.png",
-            mime="image/png"
-        )
+        with open(store.path(st.session_state.generated_image), "rb") as image_file:
+            st.download_button(
+                label="Download Image",
+                data=image_file,
+                file_name="generated_image.png",
+                mime="image/png"
+            )
+
+def load_next_video_page():
+    page = st.session_state.pixels_page + 1
+    try:
+        cards, st.session_state.pixels_has_more = search_videos(
+            st.session_state.pixels_api_key, st.session_state.pixels_search_query, page)
+        st.session_state.pixels_results += cards
+        st.session_state.pixels_page = page
+    except Exception as e:
+        st.error(f"Error searching videos: {str(e)}")
 
 # Video Search Tab
+@st.fragment
 def video_search_tab():
     st.header("📹 Video Search")
     
@@ -365,43 +563,447 @@ def video_search_tab():
         if st.button("Search Videos"):
             if st.session_state.pixels_query:
                 with st.spinner("Searching videos..."):
-                    try:
-                        headers = {
-                            "Authorization": st.session_state.pixels_api_key
-                        }
-                        
-                        response = requests.get(
-                            f"https://api.pexels.com/videos/search?query={st.session_state.pixels_query}&per_page=10",
-                            headers=headers)
-                        
-                        if response.status_code == 200:
-                            st.session_state.pixels_results = response.json().get("videos", [])
-                            if not st.session_state.pixels_results:
-                                st.warning("No videos found. Try a different search term.")
-                        else:
-                            st.error(f"API Error: {response.text}")
-                    
-                    except Exception as e:
-                        st.error(f"Error searching videos: {str(e)}")
+                    st.session_state.pixels_results = []
+                    st.session_state.pixels_page = 0
+                    st.session_state.pixels_search_query = st.session_state.pixels_query
+                    load_next_video_page()
+                    if not st.session_state.pixels_results and st.session_state.pixels_page:
+                        st.warning("No videos found. Try a different search term.")
             else:
                 st.warning("Please enter a search query")
     
     if st.session_state.pixels_results:
         st.subheader("Search Results")
+        max_resolution = st.selectbox("Max resolution:", list(VIDEO_RESOLUTIONS), index=2)
         cols = st.columns(2)
         
-        for idx, video in enumerate(st.session_state.pixels_results[:6]):
+        # Show preview images; only the selected card loads a player
+        for idx, card in enumerate(st.session_state.pixels_results):
             with cols[idx % 2]:
-                hd_video = next((v for v in video['video_files'] if v['quality'] == 'hd'), video['video_files'][0])
-                st.video(hd_video["link"])
-                st.caption(f"Duration: {video['duration']}s | By: {video['user']['name']}")
-                st.download_button(
-                    label="Download",
-                    data=requests.get(hd_video["link"]).content,
-                    file_name=f"video_{idx}.mp4",
-                    mime="video/mp4",
-                    key=f"download_{idx}"
-                )
+                link = pick_rendition(card, VIDEO_RESOLUTIONS[max_resolution])
+                if st.session_state.video_selected == card["id"]:
+                    st.video(link)
+                else:
+                    if card["image"]:
+                        st.image(card["image"], use_container_width=True)
+                    if st.button("▶ Play", key=f"play_{card['id']}"):
+                        st.session_state.video_selected = card["id"]
+                        rerun_fragment()
+                st.caption(card["caption"])
+                
+                # Only fetch the file once the user asks for it. download_button loads
+                # the whole file into memory on every rerun, so only the video prepared
+                # last gets one, and only until it is downloaded; preparing again is
+                # served from the disk cache
+                download = st.session_state.video_download
+                if download and download[0] == card["id"] and os.path.exists(download[1]):
+                    with open(download[1], "rb") as video_file:
+                        if st.download_button(
+                            label="Download",
+                            data=video_file,
+                            file_name=f"video_{card['id']}.mp4",
+                            mime="video/mp4",
+                            key=f"download_{card['id']}"
+                        ):
+                            st.session_state.video_download = None
+                elif st.button("Prepare Download", key=f"prepare_{card['id']}"):
+                    with st.spinner("Downloading video..."):
+                        try:
+                            st.session_state.video_download = (card["id"], fetch_video_to_cache(link))
+                            rerun_fragment()
+                        except Exception as e:
+                            st.error(f"Error downloading video: {str(e)}")
+        
+        if st.session_state.pixels_has_more and st.button("Load More Videos"):
+            with st.spinner("Loading more videos..."):
+                load_next_video_page()
+            rerun_fragment()
+
+# Price chart with optional indicator overlays and subplots
+INDICATOR_OPTIONS = ["SMA 20", "SMA 50", "EMA 20", "Bollinger Bands", "VWAP", "RSI", "MACD", "Volatility"]
+
+def build_price_figure(df, ind, title, chart_type, indicators):
+    lower = [name for name in ("RSI", "MACD", "Volatility") if name in indicators]
+    fig = make_subplots(
+        rows=1 + len(lower), cols=1, shared_xaxes=True, vertical_spacing=0.04,
+        row_heights=[0.6] + [0.4 / len(lower)] * len(lower) if lower else [1.0]
+    )
+    
+    if chart_type == "Candlestick":
+        fig.add_trace(go.Candlestick(
+            x=df["time"], open=df["open"], high=df["high"], low=df["low"], close=df["close"], name="Price"
+        ), row=1, col=1)
+    else:
+        fig.add_trace(go.Scatter(x=df["time"], y=df["close"], mode="lines", name="Close"), row=1, col=1)
+    
+    overlays = {"SMA 20": ["sma_20"], "SMA 50": ["sma_50"], "EMA 20": ["ema_20"],
+                "Bollinger Bands": ["bb_upper", "bb_lower"], "VWAP": ["vwap"]}
+    for name, columns in overlays.items():
+        if name in indicators:
+            for column in columns:
+                fig.add_trace(go.Scatter(x=df["time"], y=ind[column], mode="lines", name=column.upper(),
+                                         line={"width": 1}), row=1, col=1)
+    
+    for row, name in enumerate(lower, start=2):
+        if name == "RSI":
+            fig.add_trace(go.Scatter(x=df["time"], y=ind["rsi_14"], mode="lines", name="RSI 14"), row=row, col=1)
+        elif name == "MACD":
+            fig.add_trace(go.Bar(x=df["time"], y=ind["macd_hist"], name="MACD Hist"), row=row, col=1)
+            fig.add_trace(go.Scatter(x=df["time"], y=ind["macd"], mode="lines", name="MACD"), row=row, col=1)
+            fig.add_trace(go.Scatter(x=df["time"], y=ind["macd_signal"], mode="lines", name="Signal"), row=row, col=1)
+        else:
+            fig.add_trace(go.Scatter(x=df["time"], y=ind["volatility_20"], mode="lines", name="Volatility 20"), row=row, col=1)
+        fig.update_yaxes(title_text=name, row=row, col=1)
+    
+    fig.update_layout(
+        title=title,
+        template="plotly_white",
+        xaxis_rangeslider_visible=False,
+        yaxis_title="Price (USD)",
+        hovermode="x unified",
+        height=450 + 150 * len(lower)
+    )
+    return fig
+
+def render_price_chart(placeholder, series_key, history, window, title, chart_type, indicators):
+    df = history[window]
+    if df.empty:
+        placeholder.warning("No historical data available")
+        return
+    
+    ind = get_indicators(*series_key, history)[window]
+    df, ind = downsample_bars(df, ind, chart_type)
+    placeholder.plotly_chart(build_price_figure(df, ind, title, chart_type, indicators), use_container_width=True)
+
+# Range, chart type and indicator pickers shared by the stock and crypto panels
+def chart_options(key_prefix, ranges, default_range):
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        chart_range = st.select_slider("Range:", list(ranges), value=default_range, key=f"{key_prefix}_chart_range")
+    with col2:
+        chart_type = st.radio("Chart:", ["Line", "Candlestick"], horizontal=True, key=f"{key_prefix}_chart_type")
+    with col3:
+        indicators = st.multiselect("Indicators:", INDICATOR_OPTIONS, default=["SMA 20"], key=f"{key_prefix}_indicators")
+    return chart_range, chart_type, indicators
+
+# Stock quote card from the Finnhub profile and quote; a fresh quote is also
+# remembered for chat grounding
+def render_stock_quote(placeholder, symbol, stock_info, quote_data, fresh=False):
+    if isinstance(stock_info, Exception):
+        placeholder.error(f"Stock info error: {str(stock_info)}")
+        return
+    if isinstance(quote_data, Exception):
+        placeholder.error(f"Quote error: {str(quote_data)}")
+        return
+    
+    if fresh:
+        remember_stock_quote(st.session_state.finhub_api_key, symbol, stock_info, quote_data)
+    placeholder.markdown(f"""
+    <div class="custom-card">
+        <h3>{stock_info.get('name', 'N/A')} ({symbol})</h3>
+        <p><strong>Current Price:</strong> ${quote_data.get('c', 'N/A'):,.2f}</p>
+        <p><strong>Change:</strong> <span style="color: {'red' if quote_data.get('d', 0) < 0 else 'green'}">
+            {quote_data.get('d', 'N/A'):,.2f} ({quote_data.get('dp', 'N/A'):,.2f}%)
+        </span></p>
+        <p><strong>High:</strong> ${quote_data.get('h', 'N/A'):,.2f}</p>
+        <p><strong>Low:</strong> ${quote_data.get('l', 'N/A'):,.2f}</p>
+        <p><strong>Exchange:</strong> {stock_info.get('exchange', 'N/A')}</p>
+        <p><strong>Industry:</strong> {stock_info.get('finnhubIndustry', 'N/A')}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+# Stock price chart over the chosen range from the local price store
+def render_stock_history(placeholder, symbol, history, chart_range, chart_type, indicators):
+    if isinstance(history, Exception):
+        placeholder.error(f"Historical data error: {str(history)}")
+        return
+    
+    interval = STOCK_CHART_RANGES[chart_range][0]
+    window = history["time"] >= stock_range_start(chart_range)
+    render_price_chart(placeholder, ("twelve", symbol, interval), history, window,
+                       f"{symbol} Price ({chart_range})", chart_type, indicators)
+
+# Crypto price card from the CoinAPI exchange rate
+def render_crypto_quote(placeholder, symbol, crypto_data, fresh=False):
+    if isinstance(crypto_data, Exception):
+        placeholder.error(f"Crypto data error: {str(crypto_data)}")
+        return
+    
+    if fresh:
+        remember_crypto_quote(st.session_state.coinapi_api_key, symbol, crypto_data)
+    placeholder.markdown(f"""
+    <div class="custom-card">
+        <h3>{symbol}/USD</h3>
+        <p><strong>Current Price:</strong> ${crypto_data.get('rate', 'N/A'):,.2f}</p>
+        <p><strong>Time:</strong> {crypto_data.get('time', 'N/A')}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+# Crypto price chart over the chosen range from the local price store
+def render_crypto_history(placeholder, symbol, history, chart_range, chart_type, indicators):
+    if isinstance(history, Exception):
+        placeholder.error(f"Historical data error: {str(history)}")
+        return
+    
+    interval = CRYPTO_CHART_RANGES[chart_range][0]
+    window = history["time"] >= crypto_range_start(chart_range)
+    render_price_chart(placeholder, ("coinapi", symbol, interval), history, window,
+                       f"{symbol} Price ({chart_range})", chart_type, indicators)
+
+# Stocks panel
+@st.fragment
+def stock_panel():
+    st.subheader("Stock Market Data")
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.session_state.stock_symbol = st.text_input(
+            "Stock Symbol:", 
+            value=st.session_state.stock_symbol,
+            placeholder="AAPL, MSFT, GOOGL..."
+        )
+        chart_range, chart_type, indicators = chart_options("stock", STOCK_CHART_RANGES, "1Y")
+    
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("Get Stock Data"):
+            if st.session_state.stock_symbol:
+                st.session_state.stock_loaded = st.session_state.stock_symbol
+                st.session_state.stock_card = None
+            else:
+                st.warning("Please enter a stock symbol")
+        
+        # The last fetched symbol stays on screen: changing the range, chart type or
+        # indicators redraws it, loading bars for a new interval when needed
+        symbol = st.session_state.stock_loaded
+        if symbol:
+            with st.spinner("Fetching stock data..."):
+                try:
+                    # The lookups are independent, so issue them together
+                    futures = {
+                        submit_fetch(
+                            load_stock_history,
+                            st.session_state.twelve_api_key,
+                            symbol,
+                            STOCK_CHART_RANGES[chart_range][0]): "history",
+                    }
+                    if st.session_state.stock_card is None:
+                        futures[submit_fetch(fetch_stock_profile, st.session_state.finhub_api_key, symbol)] = "profile"
+                        futures[submit_fetch(fetch_stock_quote, st.session_state.finhub_api_key, symbol)] = "quote"
+                    
+                    # Render the quote card and the chart as soon as their data lands
+                    card_placeholder = st.empty()
+                    chart_placeholder = st.empty()
+                    if st.session_state.stock_card is not None:
+                        render_stock_quote(card_placeholder, symbol, *st.session_state.stock_card)
+                    responses = {}
+                    for future in as_completed(futures):
+                        name = futures[future]
+                        if name == "history":
+                            render_stock_history(chart_placeholder, symbol, future_outcome(future), chart_range, chart_type, indicators)
+                            continue
+                        responses[name] = future_outcome(future)
+                        if "profile" in responses and "quote" in responses:
+                            st.session_state.stock_card = (responses["profile"], responses["quote"])
+                            render_stock_quote(card_placeholder, symbol, *st.session_state.stock_card, fresh=True)
+                
+                except Exception as e:
+                    st.error(f"Error fetching stock data: {str(e)}")
+
+# Crypto panel
+@st.fragment
+def crypto_panel():
+    st.subheader("Cryptocurrency Data")
+    
+    if not st.session_state.get("coinapi_api_key"):
+        with st.container():
+            st.markdown('<div class="custom-card">', unsafe_allow_html=True)
+            coinapi_api_key = st.text_input("Enter your CoinAPI key:", type="password", key="coinapi_key")
+            if coinapi_api_key:
+                st.session_state.coinapi_api_key = coinapi_api_key
+                st.success("API key saved!")
+            st.markdown('</div>', unsafe_allow_html=True)
+            return
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.session_state.crypto_symbol = st.text_input(
+            "Crypto Symbol:", 
+            value=st.session_state.crypto_symbol,
+            placeholder="BTC, ETH, SOL..."
+        )
+        chart_range, chart_type, indicators = chart_options("crypto", CRYPTO_CHART_RANGES, "30D")
+    
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("Get Crypto Data"):
+            if st.session_state.crypto_symbol:
+                st.session_state.crypto_loaded = st.session_state.crypto_symbol
+                st.session_state.crypto_card = None
+            else:
+                st.warning("Please enter a crypto symbol")
+        
+        # Redrawn on every range, chart type or indicator change, like the stock chart
+        symbol = st.session_state.crypto_loaded
+        if symbol:
+            with st.spinner("Fetching crypto data..."):
+                try:
+                    futures = {
+                        submit_fetch(
+                            load_crypto_history,
+                            st.session_state.coinapi_api_key,
+                            symbol,
+                            CRYPTO_CHART_RANGES[chart_range][0]): "history",
+                    }
+                    if st.session_state.crypto_card is None:
+                        futures[submit_fetch(fetch_crypto_rate, st.session_state.coinapi_api_key, symbol)] = "rate"
+                    
+                    card_placeholder = st.empty()
+                    chart_placeholder = st.empty()
+                    if st.session_state.crypto_card is not None:
+                        render_crypto_quote(card_placeholder, symbol, st.session_state.crypto_card)
+                    for future in as_completed(futures):
+                        if futures[future] == "rate":
+                            st.session_state.crypto_card = future_outcome(future)
+                            render_crypto_quote(card_placeholder, symbol, st.session_state.crypto_card, fresh=True)
+                        else:
+                            render_crypto_history(chart_placeholder, symbol, future_outcome(future), chart_range, chart_type, indicators)
+                
+                except Exception as e:
+                    st.error(f"Error fetching crypto data: {str(e)}")
+
+# Watchlist panel
+@st.fragment
+def watchlist_panel():
+    st.subheader("Watchlist")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.session_state.watchlist_stocks = st.text_area(
+            "Stock Symbols:",
+            value=st.session_state.watchlist_stocks,
+            placeholder="AAPL, MSFT, GOOGL..."
+        )
+    with col2:
+        st.session_state.watchlist_crypto = st.text_area(
+            "Crypto Symbols:",
+            value=st.session_state.watchlist_crypto,
+            placeholder="BTC, ETH, SOL..."
+        )
+    
+    if st.button("Refresh Watchlist"):
+        stock_symbols = parse_symbols(st.session_state.watchlist_stocks)
+        crypto_symbols = parse_symbols(st.session_state.watchlist_crypto)
+        if crypto_symbols and not st.session_state.get("coinapi_api_key"):
+            st.info("Add a CoinAPI key in the Crypto tab to include crypto symbols.")
+            crypto_symbols = []
+        
+        if stock_symbols or crypto_symbols:
+            with st.spinner(f"Refreshing {len(stock_symbols) + len(crypto_symbols)} symbols..."):
+                try:
+                    keys = {
+                        "finnhub": st.session_state.finhub_api_key,
+                        "twelve": st.session_state.twelve_api_key,
+                        "coinapi": st.session_state.get("coinapi_api_key")
+                    }
+                    df, failed = build_watchlist_table(keys, stock_symbols, crypto_symbols)
+                    st.session_state.watchlist_table = df
+                    if failed:
+                        st.warning(f"Could not fetch: {', '.join(failed)}")
+                except Exception as e:
+                    st.error(f"Error refreshing watchlist: {str(e)}")
+        else:
+            st.warning("Please enter at least one symbol")
+    
+    if st.session_state.watchlist_table is not None:
+        st.dataframe(
+            st.session_state.watchlist_table[["Symbol", "Type", "Price", "Change", "Change %", "Trend"]],
+            column_config={
+                "Price": st.column_config.NumberColumn(format="$%.2f"),
+                "Change": st.column_config.NumberColumn(format="%.2f"),
+                "Change %": st.column_config.NumberColumn(format="%.2f%%"),
+                "Trend": st.column_config.LineChartColumn(f"{WATCHLIST_SPARKLINE_DAYS}d Trend")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+# Live panel
+LIVE_FPS = 4
+LIVE_VIEW_SECONDS = 10 * 60
+
+@st.fragment
+def live_panel():
+    st.subheader("Live Ticker")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.session_state.live_symbols = st.text_input(
+            "Live Symbols:",
+            value=st.session_state.live_symbols,
+            placeholder="AAPL, BINANCE:BTCUSDT..."
+        )
+    with col2:
+        source = st.selectbox("Feed:", LIVE_SOURCES)
+    if "Finnhub" not in LIVE_SOURCES:
+        st.caption("Install websocket-client to stream live Finnhub trades.")
+    if st.session_state.live_error:
+        st.error(f"Live feed error: {st.session_state.live_error}")
+    
+    symbols = parse_symbols(st.session_state.live_symbols)
+    if not st.session_state.live_running:
+        if st.button("Start Live View"):
+            if symbols:
+                st.session_state.live_running = True
+                st.session_state.live_error = None
+                rerun_fragment()
+            else:
+                st.warning("Please enter at least one symbol")
+        return
+    
+    if st.button("Stop Live View"):
+        stop_live_view()
+    live_chart(source, symbols)
+
+# A full rerun also drops the chart fragment's refresh timer
+def stop_live_view(error=None):
+    st.session_state.live_running = False
+    st.session_state.live_window = None
+    st.session_state.live_error = error
+    st.rerun()
+
+# Redrawn LIVE_FPS times a second as a short fragment run, appending only the
+# ticks that arrived since the last frame, so clicks elsewhere never queue behind it
+@st.fragment(run_every=1 / LIVE_FPS)
+def live_chart(source, symbols):
+    window = st.session_state.live_window
+    if window is None or window["source"] != source or window["symbols"] != symbols:
+        window = st.session_state.live_window = {
+            "source": source,
+            "symbols": symbols,
+            "feed": get_ticker_hub().get(source, symbols, st.session_state.finhub_api_key),
+            "started": time.monotonic(),
+            "seqs": dict.fromkeys(symbols, 0),
+            "times": {symbol: np.empty(0) for symbol in symbols},
+            "prices": {symbol: np.empty(0) for symbol in symbols}
+        }
+    feed = window["feed"]
+    if feed.stopped.is_set() or time.monotonic() - window["started"] > LIVE_VIEW_SECONDS:
+        stop_live_view(feed.error)
+    feed.touch()
+    
+    for symbol in symbols:
+        new_times, new_prices, window["seqs"][symbol] = feed.rings[symbol].since(window["seqs"][symbol])
+        if len(new_times):
+            window["times"][symbol] = np.concatenate([window["times"][symbol], new_times])[-LIVE_RING_SIZE:]
+            window["prices"][symbol] = np.concatenate([window["prices"][symbol], new_prices])[-LIVE_RING_SIZE:]
+    
+    fig = go.Figure([
+        go.Scatter(x=pd.to_datetime(window["times"][symbol], unit="s"), y=window["prices"][symbol], mode="lines", name=symbol)
+        for symbol in symbols
+    ])
+    fig.update_layout(template="plotly_white", xaxis_title="Time", yaxis_title="Price (USD)", hovermode="x unified")
+    st.plotly_chart(fig, use_container_width=True)
 
 # Finance Tab
 def finance_tab():
@@ -425,170 +1027,44 @@ def finance_tab():
             st.markdown('</div>', unsafe_allow_html=True)
             return
     
-    tab1, tab2 = st.tabs(["Stocks", "Crypto"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Stocks", "Crypto", "Watchlist", "Live"])
     
     with tab1:
-        st.subheader("Stock Market Data")
-        
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            st.session_state.stock_symbol = st.text_input(
-                "Stock Symbol:", 
-                value=st.session_state.stock_symbol,
-                placeholder="AAPL, MSFT, GOOGL..."
-            )
-        
-        with col2:
-            st.markdown("<br>", unsafe_allow_html=True)
-            if st.button("Get Stock Data"):
-                if st.session_state.stock_symbol:
-                    with st.spinner("Fetching stock data..."):
-                        try:
-                            response = requests.get(
-                                f"https://finnhub.io/api/v1/stock/profile2?symbol={st.session_state.stock_symbol}&token={st.session_state.finhub_api_key}")
-                            
-                            if response.status_code == 200:
-                                stock_info = response.json()
-                                
-                                quote_response = requests.get(
-                                    f"https://finnhub.io/api/v1/quote?symbol={st.session_state.stock_symbol}&token={st.session_state.finhub_api_key}")
-                                
-                                if quote_response.status_code == 200:
-                                    quote_data = quote_response.json()
-                                    
-                                    st.markdown(f"""
-                                    <div class="custom-card">
-                                        <h3>{stock_info.get('name', 'N/A')} ({st.session_state.stock_symbol})</h3>
-                                        <p><strong>Current Price:</strong> ${quote_data.get('c', 'N/A'):,.2f}</p>
-                                        <p><strong>Change:</strong> <span style="color: {'red' if quote_data.get('d', 0) < 0 else 'green'}">
-                                            {quote_data.get('d', 'N/A'):,.2f} ({quote_data.get('dp', 'N/A'):,.2f}%)
-                                        </span></p>
-                                        <p><strong>High:</strong> ${quote_data.get('h', 'N/A'):,.2f}</p>
-                                        <p><strong>Low:</strong> ${quote_data.get('l', 'N/A'):,.2f}</p>
-                                        <p><strong>Exchange:</strong> {stock_info.get('exchange', 'N/A')}</p>
-                                        <p><strong>Industry:</strong> {stock_info.get('finnhubIndustry', 'N/A')}</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    end_date = datetime.datetime.now()
-                                    start_date = end_date - datetime.timedelta(days=365)
-                                    
-                                    hist_response = requests.get(
-                                        f"https://api.twelvedata.com/time_series?symbol={st.session_state.stock_symbol}&interval=1day&start_date={start_date.strftime('%Y-%m-%d')}&end_date={end_date.strftime('%Y-%m-%d')}&apikey={st.session_state.twelve_api_key}")
-                                    
-                                    if hist_response.status_code == 200:
-                                        hist_data = hist_response.json().get("values", [])
-                                        if hist_data:
-                                            df = pd.DataFrame(hist_data)
-                                            df['datetime'] = pd.to_datetime(df['datetime'])
-                                            df['close'] = pd.to_numeric(df['close'])
-                                            
-                                            fig = px.line(df, x='datetime', y='close', 
-                                                         title=f"{st.session_state.stock_symbol} Price (1 Year)")
-                                            fig.update_layout(
-                                                template="plotly_white",
-                                                xaxis_title="Date",
-                                                yaxis_title="Price (USD)",
-                                                hovermode="x unified"
-                                            )
-                                            st.plotly_chart(fig, use_container_width=True)
-                                        else:
-                                            st.warning("No historical data available")
-                                    else:
-                                        st.error(f"Historical data error: {hist_response.text}")
-                                else:
-                                    st.error(f"Quote error: {quote_response.text}")
-                            else:
-                                st.error(f"Stock info error: {response.text}")
-                        
-                        except Exception as e:
-                            st.error(f"Error fetching stock data: {str(e)}")
-                else:
-                    st.warning("Please enter a stock symbol")
+        stock_panel()
     
     with tab2:
-        st.subheader("Cryptocurrency Data")
-        
-        if not st.session_state.get("coinapi_api_key"):
-            with st.container():
-                st.markdown('<div class="custom-card">', unsafe_allow_html=True)
-                coinapi_api_key = st.text_input("Enter your CoinAPI key:", type="password", key="coinapi_key")
-                if coinapi_api_key:
-                    st.session_state.coinapi_api_key = coinapi_api_key
-                    st.success("API key saved!")
-                st.markdown('</div>', unsafe_allow_html=True)
-                return
-        
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            st.session_state.crypto_symbol = st.text_input(
-                "Crypto Symbol:", 
-                value=st.session_state.crypto_symbol,
-                placeholder="BTC, ETH, SOL..."
-            )
-        
-        with col2:
-            st.markdown("<br>", unsafe_allow_html=True)
-            if st.button("Get Crypto Data"):
-                if st.session_state.crypto_symbol:
-                    with st.spinner("Fetching crypto data..."):
-                        try:
-                            headers = {
-                                "X-CoinAPI-Key": st.session_state.coinapi_api_key
-                            }
-                            
-                            response = requests.get(
-                                f"https://rest.coinapi.io/v1/exchangerate/{st.session_state.crypto_symbol}/USD",
-                                headers=headers)
-                            
-                            if response.status_code == 200:
-                                crypto_data = response.json()
-                                
-                                end_time = datetime.datetime.now()
-                                start_time = end_time - datetime.timedelta(days=30)
-                                
-                                hist_response = requests.get(
-                                    f"https://rest.coinapi.io/v1/ohlcv/{st.session_state.crypto_symbol}/USD/history?period_id=1DAY&time_start={start_time.strftime('%Y-%m-%dT%H:%M:%S')}&time_end={end_time.strftime('%Y-%m-%dT%H:%M:%S')}&limit=30",
-                                    headers=headers)
-                                
-                                if hist_response.status_code == 200:
-                                    hist_data = hist_response.json()
-                                    
-                                    st.markdown(f"""
-                                    <div class="custom-card">
-                                        <h3>{st.session_state.crypto_symbol}/USD</h3>
-                                        <p><strong>Current Price:</strong> ${crypto_data.get('rate', 'N/A'):,.2f}</p>
-                                        <p><strong>Time:</strong> {crypto_data.get('time', 'N/A')}</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    if hist_data:
-                                        df = pd.DataFrame(hist_data)
-                                        df['time_period_start'] = pd.to_datetime(df['time_period_start'])
-                                        df['price_close'] = pd.to_numeric(df['price_close'])
-                                        
-                                        fig = px.line(df, x='time_period_start', y='price_close', 
-                                                     title=f"{st.session_state.crypto_symbol} Price (30 Days)")
-                                        fig.update_layout(
-                                            template="plotly_white",
-                                            xaxis_title="Date",
-                                            yaxis_title="Price (USD)",
-                                            hovermode="x unified"
-                                        )
-                                        st.plotly_chart(fig, use_container_width=True)
-                                    else:
-                                        st.warning("No historical data available")
-                                else:
-                                    st.error(f"Historical data error: {hist_response.text}")
-                            else:
-                                st.error(f"Crypto data error: {response.text}")
-                        
-                        except Exception as e:
-                            st.error(f"Error fetching crypto data: {str(e)}")
-                else:
-                    st.warning("Please enter a crypto symbol")
+        crypto_panel()
+    
+    with tab3:
+        watchlist_panel()
+    
+    # Last, since the live view keeps the script running while it streams
+    with tab4:
+        live_panel()
+
+def news_card(article):
+    return f"""
+    <div class="custom-card">
+        <h4><a href="{article['url']}" target="_blank">{article['title']}</a></h4>
+        <p><em>{article['source']['name']} • {article['publishedAt'][:10]}</em></p>
+        <p>{article['description']}</p>
+    </div>
+    """
+
+NEWS_DATE_FILTERS = {"Any time": None, "Past day": 1, "Past week": 7, "Past month": 30}
+
+# Serve the next page of the current search; each page's cards are rendered
+# to HTML once, when the page arrives
+def load_next_news_page():
+    search = st.session_state.news_search
+    articles = search.next_page(st.session_state.news_api_key)
+    if search.error:
+        st.error(f"Error searching news: {search.error}")
+    if articles:
+        st.session_state.news_results.append("".join(news_card(article) for article in articles))
 
 # News Tab
+@st.fragment
 def news_tab():
     st.header("📰 News Explorer")
     
@@ -609,6 +1085,12 @@ def news_tab():
     </div>
     """, unsafe_allow_html=True)
     
+    col1, col2 = st.columns(2)
+    with col1:
+        st.session_state.news_date_filter = st.selectbox("Published:", list(NEWS_DATE_FILTERS))
+    with col2:
+        st.session_state.news_sort = st.selectbox("Sort by:", ["Relevance", "Newest"])
+    
     col1, col2 = st.columns([3, 1])
     with col1:
         st.session_state.news_query = st.text_input(
@@ -622,33 +1104,27 @@ def news_tab():
         if st.button("Search News"):
             if st.session_state.news_query:
                 with st.spinner("Searching news..."):
-                    try:
-                        response = requests.get(
-                            f"https://newsapi.org/v2/everything?q={st.session_state.news_query}&pageSize=10&apiKey={st.session_state.news_api_key}")
-                        
-                        if response.status_code == 200:
-                            st.session_state.news_results = response.json().get("articles", [])
-                            if not st.session_state.news_results:
-                                st.warning("No news found. Try a different search term.")
-                        else:
-                            st.error(f"API Error: {response.text}")
-                    
-                    except Exception as e:
-                        st.error(f"Error searching news: {str(e)}")
+                    st.session_state.news_search = NewsSearch(
+                        st.session_state.news_query,
+                        NEWS_DATE_FILTERS[st.session_state.news_date_filter],
+                        st.session_state.news_sort == "Newest"
+                    )
+                    st.session_state.news_results = []
+                    load_next_news_page()
+                    if not st.session_state.news_results:
+                        st.warning("No news found. Try a different search term.")
             else:
                 st.warning("Please enter a search query")
     
     if st.session_state.news_results:
         st.subheader("Top News Articles")
-        for article in st.session_state.news_results[:5]:
-            with st.container():
-                st.markdown(f"""
-                <div class="custom-card">
-                    <h4><a href="{article['url']}" target="_blank">{article['title']}</a></h4>
-                    <p><em>{article['source']['name']} • {article['publishedAt'][:10]}</em></p>
-                    <p>{article['description']}</p>
-                </div>
-                """, unsafe_allow_html=True)
+        for page_html in st.session_state.news_results:
+            st.markdown(page_html, unsafe_allow_html=True)
+        
+        if st.session_state.news_search.has_more and st.button("Load More Articles"):
+            with st.spinner("Loading more articles..."):
+                load_next_news_page()
+            rerun_fragment()
 
 # Main App
 def main():
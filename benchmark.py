@@ -0,0 +1,380 @@
+# Offline benchmark of the app against mock_providers.py, reporting:
+#   - tab latency: each tab's main action end to end through Streamlit's script
+#     runner, and the cost of a plain rerun once its results are on screen
+#   - throughput: N concurrent simulated sessions making the tabs' provider calls
+#     through core, sharing caches and pools the way sessions share a server process
+#   - memory per session: heap and RSS growth per live session that used every tab
+#   python benchmark.py --sessions 8 --rounds 3 --latency 0.05 --json results.json
+# The mock server runs in its own process so it does not compete with the app for
+# the GIL. The Live tab is left out since it streams until stopped
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Stores and caches go to a scratch directory so every run starts cold
+SCRATCH_DIR = tempfile.mkdtemp(prefix="chatbot_bench_")
+tempfile.tempdir = SCRATCH_DIR
+
+import requests
+from streamlit.testing.v1 import AppTest
+import core
+from mock_providers import add_mock_arguments, mock_base_urls, mock_settings, serve_mock
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Every simulated user brings their own keys, as the app asks each session for them,
+# so client-side rate limits and key-scoped caches apply per session
+SESSION_KEY_NAMES = ["openai_api_key", "together_api_key", "pixels_api_key", "finhub_api_key",
+                     "twelve_api_key", "coinapi_api_key", "news_api_key"]
+STOCK_SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "NFLX", "AMD", "INTC", "ORCL", "IBM"]
+CRYPTO_SYMBOLS = ["BTC", "ETH", "SOL", "ADA", "XRP", "DOGE", "DOT", "LTC"]
+TOPICS = ["technology", "markets", "energy", "climate", "sports", "science", "health", "travel"]
+
+# Start the mock server in a child process and wait until it answers
+def start_mock_process(args):
+    process = multiprocessing.Process(
+        target=serve_mock, args=(mock_settings(args), "127.0.0.1", args.mock_port), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{args.mock_port}"
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    process.terminate()
+    raise SystemExit(f"Mock server did not start on {url}")
+
+def pick(items, i):
+    return items[i % len(items)]
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+# Tab scenarios run the real tab functions under AppTest, one session per AppTest
+TAB_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+import streamlit as st
+import app
+app.init_session_state()
+for name, value in {keys!r}.items():
+    st.session_state[name] = value
+app.{function}()
+"""
+
+def tab_session(function, api_key, timeout):
+    keys = dict.fromkeys(SESSION_KEY_NAMES, api_key)
+    script = TAB_SCRIPT.format(root=ROOT, keys=keys, function=function)
+    return AppTest.from_string(script, default_timeout=timeout).run()
+
+def widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+def click(at, label):
+    widget(at.button, label).click()
+    return at.run()
+
+def chat_action(at, i):
+    return at.chat_input[0].set_value(f"What moved {pick(STOCK_SYMBOLS, i)} and {pick(CRYPTO_SYMBOLS, i)} today?").run()
+
+# Includes waiting for the queued jobs and the rerun that shows the images
+def image_action(at, i):
+    widget(at.text_area, "Image Prompt:").set_value(f"A lighthouse over a {pick(TOPICS, i)} themed city, take {i}")
+    at = click(at, "Generate Image")
+    wait_for_images(at.session_state["image_jobs"])
+    return at.run()
+
+def wait_for_images(job_ids, timeout=300):
+    deadline = time.monotonic() + timeout
+    jobs = core.get_image_jobs()
+    while time.monotonic() < deadline:
+        if all(job is None or job.status in ("done", "failed") for job in map(jobs.get, job_ids)):
+            return
+        time.sleep(0.01)
+
+def video_action(at, i):
+    widget(at.text_input, "Search Videos:").set_value(f"{pick(TOPICS, i)} {i}")
+    return click(at, "Search Videos")
+
+def stock_action(at, i):
+    widget(at.text_input, "Stock Symbol:").set_value(pick(STOCK_SYMBOLS, i))
+    return click(at, "Get Stock Data")
+
+def crypto_action(at, i):
+    widget(at.text_input, "Crypto Symbol:").set_value(pick(CRYPTO_SYMBOLS, i))
+    return click(at, "Get Crypto Data")
+
+def watchlist_action(at, i):
+    widget(at.text_area, "Stock Symbols:").set_value(", ".join(STOCK_SYMBOLS[i % 4:i % 4 + 5]))
+    widget(at.text_area, "Crypto Symbols:").set_value(", ".join(CRYPTO_SYMBOLS[i % 3:i % 3 + 3]))
+    return click(at, "Refresh Watchlist")
+
+def news_action(at, i):
+    widget(at.text_input, "Search News:").set_value(f"{pick(TOPICS, i)} {i}")
+    return click(at, "Search News")
+
+# tab -> (app function, action)
+TAB_SCENARIOS = {
+    "Chat": ("chat_tab", chat_action),
+    "Images": ("image_generation_tab", image_action),
+    "Videos": ("video_search_tab", video_action),
+    "Stocks": ("stock_panel", stock_action),
+    "Crypto": ("crypto_panel", crypto_action),
+    "Watchlist": ("watchlist_panel", watchlist_action),
+    "News": ("news_tab", news_action),
+}
+
+def app_errors(at):
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+def bench_tab_latency(tabs, repeat, timeout):
+    results = {}
+    for tab in tabs:
+        function, action = TAB_SCENARIOS[tab]
+        actions, reruns, errors = [], [], []
+        for i in range(repeat):
+            at = tab_session(function, f"mock-latency-{tab}-{i}", timeout)
+            start = time.perf_counter()
+            at = action(at, i)
+            actions.append(time.perf_counter() - start)
+            errors += app_errors(at)
+            start = time.perf_counter()
+            at.run()
+            reruns.append(time.perf_counter() - start)
+        results[tab] = {
+            "action_p50": percentile(actions, 0.5),
+            "action_p95": percentile(actions, 0.95),
+            "rerun_p50": percentile(reruns, 0.5),
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None
+        }
+    return results
+
+# Simulated sessions make the same provider calls as the tabs' main actions,
+# straight through core, from one thread per session
+def chat_calls(state, i):
+    message = {"role": "user", "content": f"What moved {pick(STOCK_SYMBOLS, i)} and {pick(CRYPTO_SYMBOLS, i)} today?"}
+    core.message_tokens(message)
+    state["chat"].append(message)
+    deltas, _ = core.answer_chat(state["api_key"], state["chat"], 8000, retrieval_keys=[state["api_key"]])
+    answer = {"role": "assistant", "content": "".join(deltas)}
+    core.message_tokens(answer)
+    state["chat"].append(answer)
+
+def image_calls(state, i):
+    job_id = core.submit_image(state["api_key"], core.image_payload(f"A lighthouse over a {pick(TOPICS, i)} themed city", 1024, 1024, 30, i))
+    wait_for_images([job_id])
+    job = core.get_image_jobs().get(job_id)
+    if job is not None and job.status == "failed":
+        raise RuntimeError(job.error)
+    state["images"].append(job_id)
+
+def video_calls(state, i):
+    cards, _ = core.search_videos(state["api_key"], f"{pick(TOPICS, i)} {i}", 1)
+    state["videos"] = cards
+
+def stock_calls(state, i):
+    symbol = pick(STOCK_SYMBOLS, i)
+    futures = [
+        core.submit_fetch(core.fetch_stock_profile, state["api_key"], symbol),
+        core.submit_fetch(core.fetch_stock_quote, state["api_key"], symbol),
+        core.submit_fetch(core.load_stock_history, state["api_key"], symbol, "1day")
+    ]
+    profile, quote, history = [future.result() for future in futures]
+    core.remember_stock_quote(state["api_key"], symbol, profile, quote)
+    state["stock"] = core.get_indicators("twelve", symbol, "1day", history)
+
+def crypto_calls(state, i):
+    symbol = pick(CRYPTO_SYMBOLS, i)
+    futures = [
+        core.submit_fetch(core.fetch_crypto_rate, state["api_key"], symbol),
+        core.submit_fetch(core.load_crypto_history, state["api_key"], symbol, "1HRS")
+    ]
+    rate, history = [future.result() for future in futures]
+    core.remember_crypto_quote(state["api_key"], symbol, rate)
+    state["crypto"] = core.get_indicators("coinapi", symbol, "1HRS", history)
+
+def watchlist_calls(state, i):
+    keys = dict.fromkeys(["finnhub", "twelve", "coinapi"], state["api_key"])
+    state["watchlist"], _ = core.build_watchlist_table(keys, STOCK_SYMBOLS[i % 4:i % 4 + 5], CRYPTO_SYMBOLS[i % 3:i % 3 + 3])
+
+def news_calls(state, i):
+    search = core.NewsSearch(f"{pick(TOPICS, i)} {i}")
+    state["news"] = search.next_page(state["api_key"])
+    if search.error:
+        raise RuntimeError(search.error)
+
+SESSION_CALLS = {
+    "Chat": chat_calls,
+    "Images": image_calls,
+    "Videos": video_calls,
+    "Stocks": stock_calls,
+    "Crypto": crypto_calls,
+    "Watchlist": watchlist_calls,
+    "News": news_calls,
+}
+
+def bench_throughput(tabs, sessions, rounds):
+    timings = {tab: [] for tab in tabs}
+    errors = []
+    lock = threading.Lock()
+    
+    def run_session(session):
+        state = {"api_key": f"mock-session-{session}", "chat": [], "images": []}
+        for round_index in range(rounds):
+            for tab in tabs:
+                i = 100 + session * rounds + round_index
+                start = time.perf_counter()
+                try:
+                    SESSION_CALLS[tab](state, i)
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{tab}: {str(e)}")
+                elapsed = time.perf_counter() - start
+                with lock:
+                    timings[tab].append(elapsed)
+    
+    threads = [threading.Thread(target=run_session, args=(session,)) for session in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    
+    interactions = sum(len(values) for values in timings.values())
+    return {
+        "sessions": sessions,
+        "rounds": rounds,
+        "wall_seconds": wall,
+        "interactions_per_second": interactions / wall,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "tabs": {tab: {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95)} for tab, values in timings.items()}
+    }
+
+# Live AppTest sessions that have each used every tab once
+def bench_memory(tabs, sessions, timeout):
+    gc.collect()
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    rss_before = rss_bytes()
+    
+    live = []
+    for session in range(sessions):
+        for tab in tabs:
+            function, action = TAB_SCENARIOS[tab]
+            live.append(action(tab_session(function, f"mock-memory-{session}", timeout), 1000 + session))
+    
+    gc.collect()
+    heap_after = tracemalloc.get_traced_memory()[0]
+    rss_after = rss_bytes()
+    tracemalloc.stop()
+    result = {
+        "sessions": sessions,
+        "heap_bytes_per_session": (heap_after - heap_before) / sessions,
+        "rss_bytes_per_session": (rss_after - rss_before) / sessions if rss_before is not None else None
+    }
+    del live
+    return result
+
+def mib(value):
+    return "n/a" if value is None else f"{value / 1024 / 1024:.2f} MiB"
+
+def print_report(results):
+    latency = results.get("tab_latency")
+    if latency:
+        print(f"\nTab latency, {results['config']['repeat']} runs each (seconds)")
+        print(f"  {'tab':<10} {'action p50':>10} {'action p95':>10} {'rerun p50':>10} {'errors':>7}")
+        for tab, row in latency.items():
+            print(f"  {tab:<10} {row['action_p50']:>10.3f} {row['action_p95']:>10.3f} {row['rerun_p50']:>10.3f} {row['errors']:>7}")
+    
+    throughput = results.get("throughput")
+    if throughput:
+        print(f"\nThroughput, {throughput['sessions']} concurrent sessions x {throughput['rounds']} rounds: "
+              f"{throughput['interactions_per_second']:.2f} interactions/s over {throughput['wall_seconds']:.2f}s, "
+              f"{throughput['errors']} errors")
+        print(f"  {'tab':<10} {'p50':>8} {'p95':>8}")
+        for tab, row in throughput["tabs"].items():
+            print(f"  {tab:<10} {row['p50']:>8.3f} {row['p95']:>8.3f}")
+    
+    memory = results.get("memory")
+    if memory:
+        print(f"\nMemory per session, {memory['sessions']} sessions: "
+              f"{mib(memory['heap_bytes_per_session'])} Python heap, {mib(memory['rss_bytes_per_session'])} RSS")
+    
+    errors = [(tab, row["first_error"]) for tab, row in (latency or {}).items() if row["first_error"]]
+    if throughput and throughput["first_error"]:
+        errors.append(("concurrent sessions", throughput["first_error"]))
+    for source, error in errors:
+        print(f"\nFirst error in {source}: {error[:300]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app offline against local mock providers.")
+    parser.add_argument("--tabs", default=",".join(TAB_SCENARIOS), help="Comma-separated tabs to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per tab for the latency benchmark")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions for the throughput benchmark")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the tabs per concurrent session")
+    parser.add_argument("--memory-sessions", type=int, default=3, help="Live sessions for the memory benchmark")
+    parser.add_argument("--skip", default="", help="Comma-separated benchmarks to skip: latency, throughput, memory")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per script run")
+    parser.add_argument("--mock-url", help="Use an already running mock_providers.py server")
+    parser.add_argument("--mock-port", type=int, default=8900, help="Port for the mock server started here")
+    parser.add_argument("--json", help="Also write the results to this file")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    # Streamlit warns about running outside a server; the report is all that matters here
+    logging.disable(logging.WARNING)
+    
+    tabs = [tab.strip() for tab in args.tabs.split(",") if tab.strip()]
+    unknown = [tab for tab in tabs if tab not in TAB_SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown tabs: {', '.join(unknown)}; choose from {', '.join(TAB_SCENARIOS)}")
+    skip = {name.strip() for name in args.skip.split(",") if name.strip()}
+    
+    process = None
+    if args.mock_url:
+        url = args.mock_url
+    else:
+        process, url = start_mock_process(args)
+    os.environ.update(mock_base_urls(url))
+    
+    results = {"config": vars(args)}
+    try:
+        if "latency" not in skip:
+            results["tab_latency"] = bench_tab_latency(tabs, args.repeat, args.timeout)
+        if "throughput" not in skip:
+            results["throughput"] = bench_throughput(tabs, args.sessions, args.rounds)
+        if "memory" not in skip:
+            results["memory"] = bench_memory(tabs, args.memory_sessions, args.timeout)
+    finally:
+        if process is not None:
+            process.terminate()
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+    
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1783 @@
+# Provider logic shared by the Streamlit app and the HTTP API. Nothing here imports
+# Streamlit: API keys are passed in explicitly and shared resources are process-wide
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import json
+import re
+import bisect
+import zlib
+import pandas as pd
+import numpy as np
+import datetime
+import time
+import math
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from PIL import Image
+import io
+import os
+import base64
+import hashlib
+import tempfile
+import sqlite3
+from typing import Any, Iterator, Optional, Protocol, runtime_checkable
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+# Process-wide shared resources, created once on first use and reused by every
+# Streamlit rerun, API request and worker thread in this process
+_shared_lock = threading.RLock()
+
+def shared_resource(max_entries=None):
+    def decorate(factory):
+        instances = OrderedDict()
+        building = {}
+        
+        @functools.wraps(factory)
+        def get(*args):
+            with _shared_lock:
+                if args in instances:
+                    instances.move_to_end(args)
+                    return instances[args]
+                key_lock = building.setdefault(args, threading.Lock())
+            # Factories may open databases or connections, so only callers asking
+            # for the same instance wait while one is built
+            with key_lock:
+                with _shared_lock:
+                    if args in instances:
+                        return instances[args]
+                instance = factory(*args)
+                with _shared_lock:
+                    instances[args] = instance
+                    building.pop(args, None)
+                    if max_entries and len(instances) > max_entries:
+                        instances.popitem(last=False)
+                return instance
+        return get
+    return decorate
+
+# An upstream call that came back with a non-200 status
+class ProviderError(RuntimeError):
+    def __init__(self, status_code, text):
+        super().__init__(text)
+        self.status_code = status_code
+
+def raise_for_provider(response):
+    if response.status_code != 200:
+        raise ProviderError(response.status_code, response.text)
+
+# Pooled keep-alive HTTP sessions, one per provider, shared across sessions
+PROVIDER_POOL_SIZES = {
+    "pexels": 10,
+    "finnhub": 10,
+    "twelve": 10,
+    "coinapi": 10,
+    "news": 10,
+    "together": 4,
+}
+HTTP_TIMEOUT = (5, 30)
+IMAGE_TIMEOUT = (5, 180)
+
+@shared_resource()
+def get_http_session(provider):
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=PROVIDER_POOL_SIZES[provider],
+        max_retries=retry
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@shared_resource(max_entries=64)
+def get_openai_client(api_key, base_url):
+    return openai.OpenAI(api_key=api_key, base_url=base_url, timeout=60, max_retries=2)
+
+# Shared HTTP response cache for third-party lookups
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SECRET_PARAMS = {"token", "apikey", "apiKey"}
+CACHE_TTLS = {
+    "pexels_search": 60 * 60,
+    "finnhub_profile": 12 * 60 * 60,
+    "finnhub_quote": 15,
+    "twelve_time_series": 6 * 60 * 60,
+    "twelve_intraday": 60,
+    "coinapi_rate": 10,
+    "coinapi_history": 60 * 60,
+    "coinapi_intraday": 60,
+    "news_search": 10 * 60,
+}
+
+class CachedResponse:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+    
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+    
+    def json(self):
+        return json.loads(self.content)
+
+class ResponseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return response
+    
+    def put(self, key, response, ttl):
+        entry_size = len(response.content)
+        if entry_size > self.max_bytes:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (time.time() + ttl, response)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+    
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1].content)
+
+@shared_resource()
+def get_response_cache():
+    return ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+# Token buckets per provider and API key, sized to each provider's free-tier quota
+# as (credits, per seconds). A call costs one credit, except Twelve Data batches,
+# which cost one per symbol. Callers over the limit wait briefly instead of failing
+PROVIDER_RATE_LIMITS = {
+    "pexels": (200, 60 * 60),
+    "finnhub": (60, 60),
+    "twelve": (8, 60),
+    "coinapi": (100, 24 * 60 * 60),
+    "news": (100, 24 * 60 * 60),
+}
+RATE_LIMIT_MAX_WAIT = 5
+
+# Quotas for other plans come from the environment as <PROVIDER>_RATE_LIMIT, e.g.
+# TWELVE_RATE_LIMIT=800/60; a value of 0 turns the provider's limit off. Buckets
+# live in process memory, so when RATE_LIMIT_PROCESSES processes (e.g. API workers)
+# spend the same keys, each one gets an equal share of every quota
+def configured_rate_limits():
+    processes = max(int(os.environ.get("RATE_LIMIT_PROCESSES", "1")), 1)
+    limits = {}
+    for provider, (credits, period) in PROVIDER_RATE_LIMITS.items():
+        value = os.environ.get(f"{provider.upper()}_RATE_LIMIT", "").strip()
+        if value:
+            credits, _, period = value.partition("/")
+            credits, period = float(credits), float(period or 60)
+        if credits > 0:
+            limits[provider] = (credits / processes, period)
+    return limits
+
+class TokenBucket:
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, max_wait, cost=1):
+        # A call costing more than the whole bucket waits for a full one and leaves
+        # it in debt, so the calls after it still pay the full cost
+        needed = min(cost, self.capacity)
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+                if self.tokens >= needed:
+                    self.tokens -= cost
+                    return True
+                wait = (needed - self.tokens) / self.refill_rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class RateLimiters:
+    def __init__(self, limits):
+        self.limits = limits
+        self.buckets = {}
+        self.lock = threading.Lock()
+    
+    def acquire(self, provider, key_scope, max_wait, cost=1):
+        if provider not in self.limits:
+            return True
+        with self.lock:
+            bucket = self.buckets.get((provider, key_scope))
+            if bucket is None:
+                requests_allowed, period = self.limits[provider]
+                bucket = TokenBucket(requests_allowed, requests_allowed / period)
+                self.buckets[(provider, key_scope)] = bucket
+        return bucket.acquire(max_wait, cost)
+
+@shared_resource()
+def get_rate_limiters():
+    return RateLimiters(configured_rate_limits())
+
+# Lets concurrent identical calls share one in-flight upstream request
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+    
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            future = self.calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.calls[key] = future
+        if not owner:
+            return future.result()
+        
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+
+@shared_resource()
+def get_single_flight():
+    return SingleFlight()
+
+# Short hash of an API key, for scoping shared state without keeping the key
+def key_scope(api_key):
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+# Build a cache key from the endpoint and normalized params, scoped by a hash of the API key
+def response_cache_key(endpoint, url, params, api_key):
+    normalized = tuple(sorted(
+        (name, str(value).strip())
+        for name, value in (params or {}).items()
+        if name not in SECRET_PARAMS and value is not None
+    ))
+    return (endpoint, url, normalized, key_scope(api_key))
+
+# GET through the shared cache; only successful responses are stored. `cost` is
+# what the call counts against the provider's quota
+def cached_get(endpoint, url, params=None, headers=None, api_key=None, cost=1):
+    cache = get_response_cache()
+    key = response_cache_key(endpoint, url, params, api_key)
+    response = cache.get(key)
+    if response is not None:
+        return response
+    
+    return get_single_flight().do(key, fetch_and_cache, endpoint, url, params, headers, key, cost)
+
+# Twelve Data reports failures as HTTP 200 bodies with "status": "error", either
+# for the whole request or for single symbols of a batch
+def twelve_data_errors(content):
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None, False
+    if not isinstance(data, dict):
+        return None, False
+    if data.get("status") == "error":
+        return data, False
+    return None, any(isinstance(v, dict) and v.get("status") == "error" for v in data.values())
+
+def fetch_and_cache(endpoint, url, params, headers, key, cost=1):
+    # Endpoint names are prefixed with their provider, e.g. "finnhub_quote"
+    provider = endpoint.split("_", 1)[0]
+    if not get_rate_limiters().acquire(provider, key[3], RATE_LIMIT_MAX_WAIT, cost):
+        return CachedResponse(429, f"Rate limit reached for {provider}, please try again shortly.".encode())
+    
+    session = get_http_session(provider)
+    raw = session.get(url, params=params, headers=headers, timeout=HTTP_TIMEOUT)
+    response = CachedResponse(raw.status_code, raw.content)
+    symbol_errors = False
+    if response.status_code == 200 and provider == "twelve":
+        error, symbol_errors = twelve_data_errors(raw.content)
+        if error is not None:
+            return CachedResponse(int(error.get("code") or 502), (error.get("message") or "Twelve Data error").encode())
+    # A batch with a failed symbol is still served, but not cached, so that symbol is retried
+    if response.status_code == 200 and not symbol_errors:
+        get_response_cache().put(key, response, CACHE_TTLS[endpoint])
+    return response
+
+# Provider interfaces: the operations the app needs from each upstream API. The
+# adapters below implement them over HTTP; anything with the same methods, e.g. a
+# test double, can be swapped in with set_provider()
+JSON = Any
+
+@runtime_checkable
+class ChatProvider(Protocol):
+    def stream_chat(self, api_key: str, model: str, messages: list[dict]) -> Iterator[Any]: ...
+
+@runtime_checkable
+class ImageProvider(Protocol):
+    def generate_image(self, api_key: str, payload: dict) -> bytes: ...
+
+@runtime_checkable
+class VideoProvider(Protocol):
+    def search_videos(self, api_key: str, query: str, page: int, per_page: int) -> JSON: ...
+
+@runtime_checkable
+class StockQuoteProvider(Protocol):
+    def profile(self, api_key: str, symbol: str) -> JSON: ...
+    def quote(self, api_key: str, symbol: str) -> JSON: ...
+    def trade_stream(self, api_key: str) -> Any: ...
+
+@runtime_checkable
+class TimeSeriesProvider(Protocol):
+    def time_series(self, api_key: str, endpoint: str, params: dict) -> JSON: ...
+
+@runtime_checkable
+class CryptoProvider(Protocol):
+    def ohlcv_history(self, api_key: str, endpoint: str, symbol: str, params: dict) -> JSON: ...
+    def exchange_rate(self, api_key: str, symbol: str) -> JSON: ...
+
+@runtime_checkable
+class NewsProvider(Protocol):
+    def everything(self, api_key: str, query: str, page: int, page_size: int, since: Optional[str] = None) -> JSON: ...
+
+# Provider adapters: one class per upstream API holding its base URL, auth and the
+# calls the app makes to it. Each base URL can be overridden from the environment
+# (OPENAI_BASE_URL, FINNHUB_BASE_URL, ...), e.g. to point at mock_providers.py
+class ProviderAdapter:
+    name: Optional[str] = None
+    default_base_url: Optional[str] = None
+    
+    def __init__(self, base_url: Optional[str] = None):
+        base_url = base_url or os.environ.get(f"{self.name.upper()}_BASE_URL") or self.default_base_url
+        self.base_url = base_url.rstrip("/")
+    
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+    
+    def headers(self, api_key: str) -> Optional[dict]:
+        return None
+    
+    # Cached JSON GET; `endpoint` names the cache TTL within this provider
+    def get_json(self, endpoint: str, path: str, api_key: str, params: Optional[dict] = None, cost: int = 1) -> JSON:
+        response = cached_get(
+            f"{self.name}_{endpoint}",
+            self.url(path),
+            params=params,
+            headers=self.headers(api_key),
+            api_key=api_key,
+            cost=cost)
+        raise_for_provider(response)
+        return response.json()
+
+class OpenAIAdapter(ProviderAdapter, ChatProvider):
+    name = "openai"
+    default_base_url = "https://api.openai.com/v1"
+    
+    def stream_chat(self, api_key: str, model: str, messages: list[dict]) -> Iterator[Any]:
+        return get_openai_client(api_key, self.base_url).chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True
+        )
+
+class TogetherAdapter(ProviderAdapter, ImageProvider):
+    name = "together"
+    default_base_url = "https://api.together.xyz/v1"
+    
+    # Generate one image and return the decoded PNG bytes
+    def generate_image(self, api_key: str, payload: dict) -> bytes:
+        response = get_http_session(self.name).post(
+            self.url("/images/generations"),
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            json=payload,
+            timeout=IMAGE_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise ProviderError(response.status_code, f"API Error: {response.text}")
+        
+        image_data = response.json()
+        if "data" not in image_data or not image_data["data"]:
+            raise RuntimeError("Image generation failed. Please try again.")
+        return base64.b64decode(image_data["data"][0]["b64_json"])
+
+class PexelsAdapter(ProviderAdapter, VideoProvider):
+    name = "pexels"
+    default_base_url = "https://api.pexels.com"
+    
+    def headers(self, api_key: str) -> dict:
+        return {"Authorization": api_key}
+    
+    def search_videos(self, api_key: str, query: str, page: int, per_page: int) -> JSON:
+        return self.get_json("search", "/videos/search", api_key, {"query": query, "per_page": per_page, "page": page})
+
+class FinnhubAdapter(ProviderAdapter, StockQuoteProvider):
+    name = "finnhub"
+    default_base_url = "https://finnhub.io/api/v1"
+    
+    def __init__(self, base_url: Optional[str] = None, stream_url: Optional[str] = None):
+        super().__init__(base_url)
+        self.stream_url = stream_url or os.environ.get("FINNHUB_STREAM_URL") or "wss://ws.finnhub.io"
+    
+    def profile(self, api_key: str, symbol: str) -> JSON:
+        return self.get_json("profile", "/stock/profile2", api_key, {"symbol": symbol, "token": api_key})
+    
+    def quote(self, api_key: str, symbol: str) -> JSON:
+        return self.get_json("quote", "/quote", api_key, {"symbol": symbol, "token": api_key})
+    
+    # Websocket connection for the trade stream; needs websocket-client
+    def trade_stream(self, api_key: str) -> Any:
+        return websocket.create_connection(f"{self.stream_url}?token={api_key}", timeout=5)
+
+class TwelveDataAdapter(ProviderAdapter, TimeSeriesProvider):
+    name = "twelve"
+    default_base_url = "https://api.twelvedata.com"
+    
+    # Billed one credit per symbol, including in multi-symbol batches
+    def time_series(self, api_key: str, endpoint: str, params: dict) -> JSON:
+        cost = len(params["symbol"].split(","))
+        return self.get_json(endpoint, "/time_series", api_key, {**params, "apikey": api_key}, cost)
+
+class CoinAPIAdapter(ProviderAdapter, CryptoProvider):
+    name = "coinapi"
+    default_base_url = "https://rest.coinapi.io/v1"
+    
+    def headers(self, api_key: str) -> dict:
+        return {"X-CoinAPI-Key": api_key}
+    
+    def ohlcv_history(self, api_key: str, endpoint: str, symbol: str, params: dict) -> JSON:
+        return self.get_json(endpoint, f"/ohlcv/{symbol}/USD/history", api_key, params)
+    
+    def exchange_rate(self, api_key: str, symbol: str) -> JSON:
+        return self.get_json("rate", f"/exchangerate/{symbol}/USD", api_key)
+
+class NewsAPIAdapter(ProviderAdapter, NewsProvider):
+    name = "news"
+    default_base_url = "https://newsapi.org/v2"
+    
+    def everything(self, api_key: str, query: str, page: int, page_size: int, since: Optional[str] = None) -> JSON:
+        return self.get_json(
+            "search", "/everything", api_key,
+            {"q": query, "from": since, "pageSize": page_size, "page": page, "apiKey": api_key})
+
+PROVIDER_ADAPTERS = {
+    adapter.name: adapter
+    for adapter in (OpenAIAdapter, TogetherAdapter, PexelsAdapter, FinnhubAdapter, TwelveDataAdapter, CoinAPIAdapter, NewsAPIAdapter)
+}
+
+PROVIDER_INTERFACES = {
+    "openai": ChatProvider,
+    "together": ImageProvider,
+    "pexels": VideoProvider,
+    "finnhub": StockQuoteProvider,
+    "twelve": TimeSeriesProvider,
+    "coinapi": CryptoProvider,
+    "news": NewsProvider,
+}
+
+_provider_overrides = {}
+
+@shared_resource()
+def get_default_provider(name):
+    return PROVIDER_ADAPTERS[name]()
+
+def get_provider(name):
+    return _provider_overrides.get(name) or get_default_provider(name)
+
+# Replace a provider for this process, e.g. with a test double; None restores the adapter
+def set_provider(name, provider):
+    if provider is None:
+        _provider_overrides.pop(name, None)
+        return
+    interface = PROVIDER_INTERFACES[name]
+    if not isinstance(provider, interface):
+        raise TypeError(f"{type(provider).__name__} does not implement {interface.__name__}")
+    _provider_overrides[name] = provider
+
+# Token-budgeted chat context
+CHAT_MODEL = "gpt-4o"
+CHAT_SYSTEM_PROMPT = "You are Grok, created by xAI. Provide helpful and truthful answers."
+MESSAGE_TOKEN_OVERHEAD = 4
+
+@shared_resource()
+def get_token_encoder():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(CHAT_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text):
+    encoder = get_token_encoder()
+    if encoder is None:
+        # Rough fallback of ~4 characters per token
+        return len(text) // 4 + 1
+    return len(encoder.encode(text))
+
+# Token count for a history entry, cached on the entry itself
+def message_tokens(message):
+    if "tokens" not in message:
+        message["tokens"] = count_tokens(message["content"]) + MESSAGE_TOKEN_OVERHEAD
+    return message["tokens"]
+
+# Fit the system prompt, the latest turn and as many recent turns as the budget allows
+def build_chat_context(history, token_budget, context_messages=()):
+    system_message = {"role": "system", "content": CHAT_SYSTEM_PROMPT}
+    used = count_tokens(CHAT_SYSTEM_PROMPT) + MESSAGE_TOKEN_OVERHEAD + message_tokens(history[-1])
+    used += sum(message_tokens(message) for message in context_messages)
+    kept = [history[-1]]
+    for message in reversed(history[:-1]):
+        used += message_tokens(message)
+        if used > token_budget:
+            break
+        kept.append(message)
+    
+    messages = [
+        system_message,
+        *[{"role": m["role"], "content": m["content"]} for m in context_messages],
+        *[{"role": m["role"], "content": m["content"]} for m in reversed(kept)]
+    ]
+    return messages, len(history) - len(kept)
+
+# Durable chat store; session state only holds a bounded window of recent messages
+CHAT_DB_PATH = os.path.join(tempfile.gettempdir(), "chatbot_chats.sqlite3")
+
+class ChatStore:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    tokens INTEGER,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id)")
+    
+    def append(self, conversation_id, message):
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO messages (conversation_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, message["role"], message["content"], message.get("tokens"), time.time())
+            )
+        message["id"] = cursor.lastrowid
+        return message
+    
+    # The newest `limit` messages, oldest first
+    def recent(self, conversation_id, limit):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, role, content, tokens FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, limit)
+            ).fetchall()
+        messages = []
+        for message_id, role, content, tokens in reversed(rows):
+            message = {"id": message_id, "role": role, "content": content}
+            if tokens is not None:
+                message["tokens"] = tokens
+            messages.append(message)
+        return messages
+    
+    def count(self, conversation_id):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+    
+    def clear(self, conversation_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+
+@shared_resource()
+def get_chat_store():
+    return ChatStore(CHAT_DB_PATH)
+
+# Opt-in cache of chat answers, scoped per API key: exact match on the folded
+# conversation tail, then nearest neighbour over hashed n-gram embeddings. Near
+# matches must clear CHAT_CACHE_MIN_THRESHOLD and use the same words in the last turn
+CHAT_CACHE_TAIL_MESSAGES = 3
+CHAT_CACHE_CAPACITY = 2048
+CHAT_CACHE_TTL = 24 * 60 * 60
+CHAT_CACHE_MIN_THRESHOLD = 0.95
+EMBEDDING_DIM = 512
+
+class SemanticCache:
+    def __init__(self, capacity, dim, ttl):
+        self.ttl = ttl
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires = np.zeros(capacity)
+        self.scopes = np.full(capacity, "", dtype="<U16")
+        self.keys = [None] * capacity
+        self.words = [None] * capacity
+        self.answers = [None] * capacity
+        self.index = {}
+        self.lock = threading.Lock()
+    
+    def get(self, scope, key, vector, words, threshold):
+        threshold = max(threshold, CHAT_CACHE_MIN_THRESHOLD)
+        now = time.time()
+        with self.lock:
+            slot = self.index.get((scope, key))
+            if slot is not None and self.expires[slot] > now:
+                return self.answers[slot]
+            if threshold >= 1:
+                return None
+            scores = self.vectors @ vector
+            scores[(self.expires <= now) | (self.scopes != scope)] = -1
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold and self.words[best] == words:
+                return self.answers[best]
+        return None
+    
+    def put(self, scope, key, vector, words, answer):
+        with self.lock:
+            slot = self.index.get((scope, key))
+            if slot is None:
+                # Reuse an empty or expired slot first, otherwise the oldest entry
+                slot = int(np.argmin(self.expires))
+                self.index.pop((self.scopes[slot], self.keys[slot]), None)
+            self.vectors[slot] = vector
+            self.expires[slot] = time.time() + self.ttl
+            self.scopes[slot] = scope
+            self.keys[slot] = key
+            self.words[slot] = words
+            self.answers[slot] = answer
+            self.index[(scope, key)] = slot
+
+@shared_resource()
+def get_semantic_cache():
+    return SemanticCache(CHAT_CACHE_CAPACITY, EMBEDDING_DIM, CHAT_CACHE_TTL)
+
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+# Case and whitespace folding only: punctuation is kept, as "2+2" and "2-2" differ
+def fold_text(text):
+    return " ".join(text.lower().split())
+
+# Folded text without trailing sentence punctuation, so "hours?" and "hours" are the
+# same word for near matches, while operators such as "2+2" and "-5" are kept
+def strip_sentence_punctuation(text):
+    words = (word.rstrip("?.!,;:") for word in fold_text(text).split())
+    return " ".join(word for word in words if word)
+
+# Words a near match must share with the question
+def question_words(text):
+    return frozenset(strip_sentence_punctuation(text).split())
+
+# Folded text of the last few turns, used as the cache key
+def conversation_tail(history):
+    return "\n".join(
+        f"{m['role']}: {fold_text(m['content'])}" for m in history[-CHAT_CACHE_TAIL_MESSAGES:]
+    )
+
+# Unit-length bag of hashed words and character trigrams; word pairs make it
+# sensitive to word order as well
+def embed_text(text, word_pairs=False):
+    features = text.split()
+    if word_pairs:
+        features += [f"{a} {b}" for a, b in zip(features, features[1:])]
+    padded = f" {text} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    indices = [zlib.crc32(feature.encode()) % EMBEDDING_DIM for feature in features]
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    np.add.at(vector, indices, 1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# Retrieval over news articles and market summaries the app has fetched,
+# brute-force cosine similarity over the same hashed embeddings. Trigram scores
+# alone can't tell an off-topic question from a related one, so a snippet must
+# also contain a share of the question's content words. Snippets are scoped to
+# the API key that fetched them, so one user's searches never ground another's chat
+RETRIEVAL_CAPACITY = 8192
+RETRIEVAL_TOP_K = 5
+RETRIEVAL_MIN_SCORE = 0.15
+RETRIEVAL_MIN_WORD_SHARE = 1 / 3
+RETRIEVAL_TOKEN_BUDGET = 800
+RETRIEVAL_CHUNK_WORDS = 120
+RETRIEVAL_CHUNK_OVERLAP = 20
+STOP_WORDS = frozenset("""
+    a about after all also an and any are as at be been but by can could did do does
+    for from had has have how i if in into is it its just me more my no not of on or
+    our out over say should so some than that the their them then there these they
+    this to up us was we were what when where which who why will with would you your
+""".split())
+
+def content_words(text):
+    return frozenset(word for word in normalize_text(text).split() if len(word) > 2 and word not in STOP_WORDS)
+
+class RetrievalIndex:
+    def __init__(self, capacity, dim):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.scopes = np.full(capacity, "", dtype="<U16")
+        self.texts = [None] * capacity
+        self.words = [frozenset()] * capacity
+        self.keys = [None] * capacity
+        self.slots = {}
+        self.size = 0
+        self.next_slot = 0
+        self.lock = threading.Lock()
+    
+    # Add or replace a snippet; once full, the oldest snippets are overwritten
+    def add(self, scope, key, text):
+        vector = embed_text(normalize_text(text))
+        with self.lock:
+            slot = self.slots.get((scope, key))
+            if slot is None:
+                slot = self.next_slot
+                self.next_slot = (slot + 1) % len(self.keys)
+                self.slots.pop((self.scopes[slot], self.keys[slot]), None)
+                self.size = min(self.size + 1, len(self.keys))
+            self.vectors[slot] = vector
+            self.scopes[slot] = scope
+            self.texts[slot] = text
+            self.words[slot] = content_words(text)
+            self.keys[slot] = key
+            self.slots[(scope, key)] = slot
+    
+    # Best snippets fetched under any of `scopes`
+    def search(self, scopes, text, k, min_score):
+        vector = embed_text(normalize_text(text))
+        words = content_words(text)
+        if not words:
+            return []
+        min_shared = math.ceil(len(words) * RETRIEVAL_MIN_WORD_SHARE)
+        with self.lock:
+            if not self.size:
+                return []
+            scores = self.vectors[:self.size] @ vector
+            shared = np.fromiter((len(words & slot_words) for slot_words in self.words[:self.size]), int, self.size)
+            scores[(shared < min_shared) | ~np.isin(self.scopes[:self.size], list(scopes))] = -1
+            top = np.argsort(-scores)[:k] if self.size <= k else np.argpartition(-scores, k)[:k]
+            hits = sorted(((float(scores[i]), self.texts[i]) for i in top), reverse=True)
+        return [text for score, text in hits if score >= min_score]
+
+# Starts empty: the on-disk news index is shared by all keys and can't say who
+# fetched an article
+@shared_resource()
+def get_retrieval_index():
+    return RetrievalIndex(RETRIEVAL_CAPACITY, EMBEDDING_DIM)
+
+def chunk_words(text, size, overlap):
+    words = text.split()
+    step = size - overlap
+    return [" ".join(words[i:i + size]) for i in range(0, max(len(words) - overlap, 1), step)]
+
+def add_article_snippets(index, scope, article):
+    # NewsAPI truncates content with a "[+123 chars]" marker
+    content = re.sub(r"\s*\[\+\d+ chars\]$", "", article.get("content") or "")
+    body = f"{article.get('title') or ''}. {article.get('description') or ''} {content}"
+    header = f"News ({(article.get('source') or {}).get('name', '')}, {(article.get('publishedAt') or '')[:10]}):"
+    for idx, chunk in enumerate(chunk_words(body, RETRIEVAL_CHUNK_WORDS, RETRIEVAL_CHUNK_OVERLAP)):
+        index.add(scope, f"{article['url']}#{idx}", f"{header} {chunk}")
+
+# Top snippets for the latest question fetched with any of `api_keys`, packed into
+# a system message within a token budget
+def retrieve_context(question, api_keys):
+    scopes = {key_scope(api_key) for api_key in api_keys if api_key}
+    if not scopes:
+        return []
+    snippets = []
+    used = 0
+    for text in get_retrieval_index().search(scopes, question, RETRIEVAL_TOP_K, RETRIEVAL_MIN_SCORE):
+        used += count_tokens(text)
+        if used > RETRIEVAL_TOKEN_BUDGET:
+            break
+        snippets.append(f"- {text}")
+    if not snippets:
+        return []
+    content = "Relevant data fetched by this app (cite it when useful):\n" + "\n".join(snippets)
+    return [{"role": "system", "content": content}]
+
+# Answer the last turn of `history`, from the answer cache when `cache_threshold` is
+# set and something matches, otherwise as a streamed completion. `retrieval_keys`
+# are the data API keys whose fetched news and quotes may ground the answer.
+# Returns the text deltas and how many older messages were left out; answers are
+# cached once complete, except grounded ones, which go stale with their data
+def answer_chat(api_key, history, token_budget, retrieval_keys=None, cache_threshold=None):
+    context_messages = retrieve_context(history[-1]["content"], retrieval_keys) if retrieval_keys else []
+    if context_messages:
+        cache_threshold = None
+    if cache_threshold is not None:
+        cache_scope = key_scope(api_key)
+        cache_key = conversation_tail(history)
+        cache_vector = embed_text(strip_sentence_punctuation(cache_key), word_pairs=True)
+        cache_words = question_words(history[-1]["content"])
+        cached_answer = get_semantic_cache().get(cache_scope, cache_key, cache_vector, cache_words, cache_threshold)
+        if cached_answer is not None:
+            return iter([cached_answer]), 0
+    
+    messages, dropped = build_chat_context(history, token_budget, context_messages)
+    response = get_provider("openai").stream_chat(api_key, CHAT_MODEL, messages)
+    
+    def deltas():
+        parts = []
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+        if cache_threshold is not None:
+            get_semantic_cache().put(cache_scope, cache_key, cache_vector, cache_words, "".join(parts))
+    return deltas(), dropped
+
+# Content-addressed image store on disk; sessions and jobs only hold digests
+IMAGE_STORE_DIR = os.path.join(tempfile.gettempdir(), "chatbot_image_store")
+IMAGE_STORE_MAX_BYTES = 512 * 1024 * 1024
+THUMBNAIL_SIZE = (256, 256)
+
+class ImageStore:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+    
+    def path(self, digest):
+        return os.path.join(self.root, f"{digest}.png")
+    
+    def thumbnail_path(self, digest):
+        return os.path.join(self.root, f"{digest}.thumb.png")
+    
+    # Mark an image as recently used; False if it has been evicted
+    def touch(self, digest):
+        try:
+            os.utime(self.path(digest))
+            return True
+        except OSError:
+            return False
+    
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if self.touch(digest):
+            return digest
+        
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail(THUMBNAIL_SIZE)
+        self._write(self.thumbnail_path(digest), lambda f: img.save(f, format="PNG"))
+        self._write(self.path(digest), lambda f: f.write(data))
+        self.evict(keep=digest)
+        return digest
+    
+    # Remember which image a request produced, so repeats are served from disk
+    def link(self, key, digest):
+        self._write(os.path.join(self.root, f"{key}.ref"), lambda f: f.write(digest.encode()))
+    
+    def resolve(self, key):
+        try:
+            with open(os.path.join(self.root, f"{key}.ref"), "rb") as f:
+                digest = f.read().decode()
+        except OSError:
+            return None
+        return digest if self.touch(digest) else None
+    
+    def _write(self, path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    # Drop least recently used images beyond the size budget. Thumbnails and the
+    # request refs pointing at an image count towards its size and go with it;
+    # leftovers whose image is already gone are dropped first
+    def evict(self, keep=None):
+        with self.lock:
+            entries = {}
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                try:
+                    if name.endswith(".thumb.png"):
+                        digest = name[:-len(".thumb.png")]
+                    elif name.endswith(".png"):
+                        digest = name[:-len(".png")]
+                    elif name.endswith(".ref"):
+                        with open(path, "rb") as f:
+                            digest = f.read().decode()
+                    else:
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entry = entries.setdefault(digest, {"used": 0, "size": 0, "paths": []})
+                entry["size"] += stat.st_size
+                entry["paths"].append(path)
+                if name == f"{digest}.png":
+                    entry["used"] = stat.st_mtime
+            
+            total_size = sum(entry["size"] for entry in entries.values())
+            for digest, entry in sorted(entries.items(), key=lambda item: item[1]["used"]):
+                if total_size <= self.max_bytes:
+                    break
+                if digest == keep:
+                    continue
+                for path in entry["paths"]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total_size -= entry["size"]
+
+@shared_resource()
+def get_image_store():
+    return ImageStore(IMAGE_STORE_DIR, IMAGE_STORE_MAX_BYTES)
+
+# Background image generation jobs, shared by all sessions
+IMAGE_WORKERS = 4
+IMAGE_JOB_TTL = 60 * 60
+
+class ImageJob:
+    def __init__(self, key, payload):
+        self.id = key
+        self.prompt = payload["prompt"]
+        self.seed = payload.get("seed")
+        self.status = "queued"
+        self.digest = None
+        self.error = None
+        self.finished_at = None
+
+class ImageJobQueue:
+    def __init__(self, workers, store):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image")
+        self.jobs = {}
+        self.lock = threading.Lock()
+    
+    # Jobs are addressed by a digest of their request, so identical requests
+    # share one job unless it failed
+    def submit(self, adapter, api_key, payload):
+        self.prune()
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and job.status != "failed":
+                return key
+            job = ImageJob(key, payload)
+            self.jobs[key] = job
+        
+        job.digest = self.store.resolve(key)
+        if job.digest is not None:
+            job.status = "done"
+            job.finished_at = time.time()
+            return key
+        self.executor.submit(self.run, job, adapter, api_key, payload)
+        return key
+    
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+    
+    def run(self, job, adapter, api_key, payload):
+        job.status = "running"
+        try:
+            job.digest = self.store.put(adapter.generate_image(api_key, payload))
+            self.store.link(job.id, job.digest)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = time.time()
+    
+    # Forget finished jobs nobody has looked at for a while
+    def prune(self):
+        cutoff = time.time() - IMAGE_JOB_TTL
+        with self.lock:
+            for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+                del self.jobs[job_id]
+
+@shared_resource()
+def get_image_jobs():
+    return ImageJobQueue(IMAGE_WORKERS, get_image_store())
+
+def image_payload(prompt, width, height, steps, seed):
+    return {
+        "model": "stabilityai/stable-diffusion-xl-base-1.0",
+        "prompt": prompt,
+        "width": width,
+        "height": height,
+        "steps": steps,
+        "seed": seed,
+        "n": 1
+    }
+
+def submit_image(api_key, payload):
+    return get_image_jobs().submit(get_provider("together"), api_key, payload)
+
+# On-disk cache for video downloads, shared by all sessions
+VIDEO_CACHE_DIR = os.path.join(tempfile.gettempdir(), "chatbot_video_cache")
+VIDEO_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+VIDEO_CHUNK_SIZE = 1024 * 1024
+
+# Drop least recently used videos until the cache fits its size budget
+def evict_video_cache(keep_path=None):
+    entries = []
+    for name in os.listdir(VIDEO_CACHE_DIR):
+        path = os.path.join(VIDEO_CACHE_DIR, name)
+        if name.endswith(".mp4") and os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= VIDEO_CACHE_MAX_BYTES:
+            break
+        if path == keep_path:
+            continue
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+# Stream a video into the cache chunk by chunk and return its local path
+def fetch_video_to_cache(url):
+    os.makedirs(VIDEO_CACHE_DIR, exist_ok=True)
+    path = os.path.join(VIDEO_CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + ".mp4")
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    
+    fd, part_path = tempfile.mkstemp(dir=VIDEO_CACHE_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f, get_http_session("pexels").get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=VIDEO_CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    
+    evict_video_cache(keep_path=path)
+    return path
+
+# Paginated Pexels search. Each upstream page holds two app pages, so a search
+# costs no more requests than asking Pexels for ten results at a time
+VIDEO_PAGE_SIZE = 6
+VIDEO_UPSTREAM_PAGE_SIZE = 2 * VIDEO_PAGE_SIZE
+
+def fetch_video_page(api_key, query, page):
+    return get_provider("pexels").search_videos(api_key, query, page, VIDEO_UPSTREAM_PAGE_SIZE)
+
+# Max resolutions offered, as the short side of the frame in pixels
+VIDEO_RESOLUTIONS = {"360p": 360, "540p": 540, "720p": 720, "1080p": 1080, "4K": 2160}
+
+# Card data is worked out once per page, not on every rerun. Renditions are indexed
+# by short side, then pixel rate as a stand-in for bitrate, so picking one is a bisect
+def video_card(video):
+    files = [v for v in video['video_files'] if v.get('file_type') == 'video/mp4' and v.get('width')] or video['video_files']
+    files = sorted(files, key=lambda v: (min(v.get('width') or 0, v.get('height') or 0), (v.get('width') or 0) * (v.get('height') or 0) * (v.get('fps') or 0)))
+    return {
+        "id": video["id"],
+        "image": video.get("image"),
+        "caption": f"Duration: {video['duration']}s | By: {video['user']['name']}",
+        "sizes": [min(v.get('width') or 0, v.get('height') or 0) for v in files],
+        "links": [v["link"] for v in files]
+    }
+
+# Best rendition that fits the chosen max resolution, or the smallest one
+def pick_rendition(card, max_size):
+    idx = bisect.bisect_right(card["sizes"], max_size) - 1
+    return card["links"][max(idx, 0)]
+
+# One page of video cards, sliced from its upstream page, and whether more follow.
+# The next upstream page is only prefetched once the user has started paging
+def search_videos(api_key, query, page):
+    upstream_page, offset = divmod((page - 1) * VIDEO_PAGE_SIZE, VIDEO_UPSTREAM_PAGE_SIZE)
+    data = fetch_video_page(api_key, query, upstream_page + 1)
+    videos = data.get("videos", [])
+    last_slice = offset + VIDEO_PAGE_SIZE >= len(videos)
+    if page > 1 and last_slice and data.get("next_page"):
+        submit_fetch(fetch_video_page, api_key, query, upstream_page + 2)
+    has_more = not last_slice or bool(data.get("next_page"))
+    return [video_card(video) for video in videos[offset:offset + VIDEO_PAGE_SIZE]], has_more
+
+# Local Parquet store of typed OHLCV bars, keyed by source, symbol and interval
+PRICE_STORE_DIR = os.path.join(tempfile.gettempdir(), "chatbot_price_history")
+OHLCV_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+class PriceStore:
+    def __init__(self, root):
+        self.root = root
+        self.locks = {}
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+    
+    def path(self, source, symbol, interval):
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", f"{source}_{symbol}_{interval}")
+        return os.path.join(self.root, f"{name}.parquet")
+    
+    def key_lock(self, path):
+        with self.lock:
+            return self.locks.setdefault(path, threading.Lock())
+    
+    def load(self, path):
+        if not os.path.exists(path):
+            return pd.DataFrame({column: pd.Series(dtype="float64") for column in OHLCV_COLUMNS}).astype({"time": "datetime64[ns]"})
+        return pd.read_parquet(path)
+    
+    def merge(self, path, history, bars):
+        frame = pd.concat([history, bars], ignore_index=True) if len(history) else bars
+        frame = frame.drop_duplicates("time", keep="last").sort_values("time", ignore_index=True)
+        # Other worker processes may be merging the same file, so each write
+        # gets its own temp file and the last complete one wins
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                frame.to_parquet(f, index=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return frame
+
+@shared_resource()
+def get_price_store():
+    return PriceStore(PRICE_STORE_DIR)
+
+# Load stored bars and append only those from the last stored bar onwards
+def sync_price_history(source, symbol, interval, fetch_bars, default_start):
+    store = get_price_store()
+    path = store.path(source, symbol, interval)
+    with store.key_lock(path):
+        history = store.load(path)
+        # History that stopped before the lookback window is fetched again from the
+        # window's start, so the store never holds a gap and one upstream page (1000
+        # bars oldest-first for CoinAPI, 5000 for Twelve Data) covers every sync
+        if len(history) and history["time"].iloc[-1] < default_start:
+            history = history.iloc[0:0]
+        # Refetch the last bar too, since it may still have been forming when stored
+        start = history["time"].iloc[-1] if len(history) else default_start
+        bars = fetch_bars(symbol, interval, start)
+        if len(bars):
+            history = store.merge(path, history, bars)
+        return history
+
+# Convert raw bar records into typed OHLCV columns
+def to_ohlcv(records, columns):
+    df = pd.DataFrame(records)
+    if df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    df = df.rename(columns=columns).reindex(columns=OHLCV_COLUMNS)
+    df["time"] = pd.to_datetime(df["time"]).dt.tz_localize(None)
+    for column in OHLCV_COLUMNS[1:]:
+        df[column] = pd.to_numeric(df[column]).astype("float64")
+    return df
+
+def fetch_twelve_bars(api_key, symbol, interval, start):
+    intraday = interval != "1day"
+    end_date = datetime.date.today() + datetime.timedelta(days=1 if intraday else 0)
+    data = get_provider("twelve").time_series(
+        api_key,
+        "intraday" if intraday else "time_series",
+        {
+            "symbol": symbol,
+            "interval": interval,
+            "start_date": start.strftime('%Y-%m-%d %H:%M:%S' if intraday else '%Y-%m-%d'),
+            "end_date": end_date.strftime('%Y-%m-%d')
+        })
+    return to_ohlcv(data.get("values", []), {"datetime": "time"})
+
+def fetch_coinapi_bars(api_key, symbol, interval, start):
+    end_time = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+    records = get_provider("coinapi").ohlcv_history(
+        api_key,
+        "history" if interval == "1DAY" else "intraday",
+        symbol,
+        {
+            "period_id": interval,
+            "time_start": start.strftime('%Y-%m-%dT%H:%M:%S'),
+            "time_end": end_time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "limit": 1000
+        })
+    return to_ohlcv(records, {
+        "time_period_start": "time",
+        "price_open": "open",
+        "price_high": "high",
+        "price_low": "low",
+        "price_close": "close",
+        "volume_traded": "volume"
+    })
+
+# Days of history first fetched for each bar interval
+STOCK_INTERVAL_LOOKBACK = {"15min": 5, "1h": 30, "1day": 365}
+CRYPTO_INTERVAL_LOOKBACK = {"5MIN": 1, "15MIN": 7, "1HRS": 30, "1DAY": 30}
+
+def load_stock_history(api_key, symbol, interval="1day"):
+    default_start = datetime.datetime.now() - datetime.timedelta(days=STOCK_INTERVAL_LOOKBACK[interval])
+    return sync_price_history("twelve", symbol, interval, functools.partial(fetch_twelve_bars, api_key), default_start)
+
+def load_crypto_history(api_key, symbol, interval="1DAY"):
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    default_start = today - datetime.timedelta(days=CRYPTO_INTERVAL_LOOKBACK[interval])
+    return sync_price_history("coinapi", symbol, interval, functools.partial(fetch_coinapi_bars, api_key), default_start)
+
+# Run a future to completion, returning any exception instead of raising it
+def future_outcome(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+# Technical indicators, computed over the full stored history so long windows
+# are warmed up, and memoized per (source, symbol, interval, last bar)
+TRADING_DAYS = 252
+
+def compute_indicators(df):
+    close = df["close"]
+    out = pd.DataFrame(index=df.index)
+    out["sma_20"] = close.rolling(20).mean()
+    out["sma_50"] = close.rolling(50).mean()
+    out["ema_20"] = close.ewm(span=20, adjust=False).mean()
+    
+    std_20 = close.rolling(20).std()
+    out["bb_upper"] = out["sma_20"] + 2 * std_20
+    out["bb_lower"] = out["sma_20"] - 2 * std_20
+    
+    # Wilder's RSI
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    out["rsi_14"] = 100 - 100 / (1 + gain / loss)
+    
+    out["macd"] = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    out["macd_signal"] = out["macd"].ewm(span=9, adjust=False).mean()
+    out["macd_hist"] = out["macd"] - out["macd_signal"]
+    
+    # VWAP resets each day for intraday bars and is anchored at the first bar otherwise
+    typical = (df["high"] + df["low"] + close) / 3
+    volume = df["volume"].fillna(0)
+    days = df["time"].dt.normalize()
+    anchor = days if days.duplicated().any() else pd.Series(0, index=df.index)
+    out["vwap"] = (typical * volume).groupby(anchor).cumsum() / volume.groupby(anchor).cumsum()
+    
+    # Annualize by the number of bars per trading day, so intraday series scale correctly
+    bars_per_day = days.value_counts().median() if len(days) else 1
+    out["volatility_20"] = np.log(close).diff().rolling(20).std() * np.sqrt(TRADING_DAYS * bars_per_day)
+    return out
+
+INDICATOR_CACHE_ENTRIES = 256
+
+@shared_resource()
+def get_indicator_cache():
+    return OrderedDict()
+
+def get_indicators(source, symbol, interval, history):
+    key = (source, symbol, interval, history["time"].iloc[-1], float(history["close"].iloc[-1]), len(history))
+    cache = get_indicator_cache()
+    with _shared_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    
+    indicators = compute_indicators(history)
+    with _shared_lock:
+        cache[key] = indicators
+        while len(cache) > INDICATOR_CACHE_ENTRIES:
+            cache.popitem(last=False)
+    return indicators
+
+# Chart payloads are bounded by the plot's pixel width rather than the number of
+# stored bars: candles are merged into OHLC buckets a few pixels wide, and lines
+# keep only the min and max close of each bucket so spikes survive
+CHART_WIDTH_PX = 1200
+CANDLE_WIDTH_PX = 4
+
+def downsample_bars(df, ind, chart_type):
+    n = len(df)
+    if chart_type == "Candlestick":
+        buckets = CHART_WIDTH_PX // CANDLE_WIDTH_PX
+        if n <= buckets:
+            return df, ind
+        ids = np.arange(n) * buckets // n
+        bars = df.groupby(ids).agg({
+            "time": "first", "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+        })
+        # Indicators are read at the close of each bucket
+        ends = np.searchsorted(ids, np.arange(buckets), side="right") - 1
+        return bars.reset_index(drop=True), ind.iloc[ends].reset_index(drop=True)
+    
+    if n <= CHART_WIDTH_PX:
+        return df, ind
+    ids = np.arange(n) * (CHART_WIDTH_PX // 2) // n
+    close = pd.Series(df["close"].to_numpy())
+    grouped = close.groupby(ids)
+    keep = np.unique(np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy(), [0, n - 1]]))
+    return df.iloc[keep].reset_index(drop=True), ind.iloc[keep].reset_index(drop=True)
+
+# Chart ranges map to the bar interval fetched for them, so zooming in to a
+# narrower window re-fetches finer bars instead of stretching daily ones
+STOCK_CHART_RANGES = {"5D": ("15min", 5), "1M": ("1h", 30), "6M": ("1day", 182), "1Y": ("1day", 365)}
+CRYPTO_CHART_RANGES = {"1D": ("5MIN", 1), "7D": ("15MIN", 7), "30D": ("1HRS", 30)}
+
+def stock_range_start(chart_range):
+    return datetime.datetime.now() - datetime.timedelta(days=STOCK_CHART_RANGES[chart_range][1])
+
+def crypto_range_start(chart_range):
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    return today - datetime.timedelta(days=CRYPTO_CHART_RANGES[chart_range][1])
+
+# Shared worker pool for concurrent upstream calls
+FETCH_WORKERS = 16
+
+@shared_resource()
+def get_fetch_executor():
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+def submit_fetch(fn, *args, **kwargs):
+    return get_fetch_executor().submit(fn, *args, **kwargs)
+
+# Watchlist of many equities and crypto pairs, refreshed in bounded batches
+WATCHLIST_CONCURRENCY = 8
+WATCHLIST_HISTORY_BATCH = 8
+WATCHLIST_SPARKLINE_DAYS = 30
+
+# Split a free-form symbol list into unique upper-case tickers, keeping order
+def parse_symbols(text):
+    symbols = [part.strip().upper() for part in text.replace("\n", ",").split(",")]
+    return list(dict.fromkeys(symbol for symbol in symbols if symbol))
+
+# Run fn over items with at most `limit` calls in flight; results keep item order
+def map_bounded(fn, items, limit):
+    results = [None] * len(items)
+    pending = {}
+    queue = list(enumerate(items))
+    while queue or pending:
+        while queue and len(pending) < limit:
+            idx, item = queue.pop(0)
+            pending[submit_fetch(fn, item)] = idx
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            idx = pending.pop(future)
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                results[idx] = e
+    return results
+
+def fetch_stock_profile(api_key, symbol):
+    return get_provider("finnhub").profile(api_key, symbol)
+
+def fetch_stock_quote(api_key, symbol):
+    return get_provider("finnhub").quote(api_key, symbol)
+
+# Closing prices for a batch of stocks from one Twelve Data multi-symbol request
+def fetch_stock_closes(api_key, symbols):
+    data = get_provider("twelve").time_series(
+        api_key,
+        "time_series",
+        {"symbol": ",".join(symbols), "interval": "1day", "outputsize": WATCHLIST_SPARKLINE_DAYS})
+    
+    # Single-symbol requests are not keyed by symbol
+    series = {symbols[0]: data} if len(symbols) == 1 else data
+    closes = {}
+    for symbol in symbols:
+        values = series.get(symbol, {}).get("values", [])
+        closes[symbol] = [float(v["close"]) for v in reversed(values)]
+    return closes
+
+def fetch_crypto_rate(api_key, symbol):
+    return get_provider("coinapi").exchange_rate(api_key, symbol)
+
+def fetch_crypto_quote(api_key, symbol):
+    rate = fetch_crypto_rate(api_key, symbol)
+    try:
+        closes = load_crypto_history(api_key, symbol)["close"].tail(WATCHLIST_SPARKLINE_DAYS).tolist()
+    except Exception:
+        closes = []
+    return {"rate": rate.get("rate"), "closes": closes}
+
+# Market summaries, added to the chat retrieval index as they are fetched
+def remember_stock_quote(api_key, symbol, profile, quote):
+    get_retrieval_index().add(key_scope(api_key), f"quote:{symbol}", (
+        f"Stock quote {symbol} ({profile.get('name', 'N/A')}, {profile.get('exchange', 'N/A')}) as of "
+        f"{datetime.datetime.now():%Y-%m-%d %H:%M}: price ${quote.get('c')}, change {quote.get('d')} "
+        f"({quote.get('dp')}%), day high ${quote.get('h')}, day low ${quote.get('l')}"
+    ))
+
+def remember_crypto_quote(api_key, symbol, rate):
+    get_retrieval_index().add(key_scope(api_key), f"quote:{symbol}/USD", (
+        f"Crypto quote {symbol}/USD as of {rate.get('time', 'N/A')}: price ${rate.get('rate')}"
+    ))
+
+# Fetch every watchlist symbol and assemble one table; `keys` maps provider names to API keys
+def build_watchlist_table(keys, stock_symbols, crypto_symbols):
+    batches = [stock_symbols[i:i + WATCHLIST_HISTORY_BATCH] for i in range(0, len(stock_symbols), WATCHLIST_HISTORY_BATCH)]
+    quotes = map_bounded(functools.partial(fetch_stock_quote, keys.get("finnhub")), stock_symbols, WATCHLIST_CONCURRENCY)
+    closes = {}
+    for result in map_bounded(functools.partial(fetch_stock_closes, keys.get("twelve")), batches, WATCHLIST_CONCURRENCY):
+        if isinstance(result, dict):
+            closes.update(result)
+    crypto = map_bounded(functools.partial(fetch_crypto_quote, keys.get("coinapi")), crypto_symbols, WATCHLIST_CONCURRENCY)
+    
+    rows = []
+    for symbol, quote in zip(stock_symbols, quotes):
+        if isinstance(quote, Exception):
+            continue
+        rows.append({
+            "Symbol": symbol,
+            "Type": "Stock",
+            "Price": quote.get("c"),
+            "Prev Close": quote.get("pc"),
+            "Trend": closes.get(symbol, [])
+        })
+    for symbol, result in zip(crypto_symbols, crypto):
+        if isinstance(result, Exception):
+            continue
+        trend = result["closes"]
+        rows.append({
+            "Symbol": f"{symbol}/USD",
+            "Type": "Crypto",
+            "Price": result["rate"],
+            "Prev Close": trend[-2] if len(trend) >= 2 else None,
+            "Trend": trend
+        })
+    
+    df = pd.DataFrame(rows, columns=["Symbol", "Type", "Price", "Prev Close", "Trend"])
+    df["Price"] = pd.to_numeric(df["Price"])
+    df["Prev Close"] = pd.to_numeric(df["Prev Close"])
+    df["Change"] = df["Price"] - df["Prev Close"]
+    df["Change %"] = df["Change"] / df["Prev Close"] * 100
+    failed = [s for s, q in zip(stock_symbols, quotes) if isinstance(q, Exception)]
+    failed += [s for s, r in zip(crypto_symbols, crypto) if isinstance(r, Exception)]
+    return df, failed
+
+# Live ticks from one shared upstream stream per symbol set, kept in fixed-size rings
+LIVE_RING_SIZE = 2048
+LIVE_IDLE_SECONDS = 60
+SIMULATED_TICK_INTERVAL = 0.1
+
+class TickRing:
+    def __init__(self, capacity):
+        self.times = np.zeros(capacity)
+        self.prices = np.zeros(capacity)
+        self.seq = 0
+        self.lock = threading.Lock()
+    
+    def append(self, timestamp, price):
+        with self.lock:
+            idx = self.seq % len(self.times)
+            self.times[idx] = timestamp
+            self.prices[idx] = price
+            self.seq += 1
+    
+    # Ticks appended after sequence number `seq` (as many as the ring still holds)
+    def since(self, seq):
+        with self.lock:
+            start = max(seq, self.seq - len(self.times))
+            idx = np.arange(start, self.seq) % len(self.times)
+            return self.times[idx], self.prices[idx], self.seq
+
+class LiveFeed:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.rings = {symbol: TickRing(LIVE_RING_SIZE) for symbol in symbols}
+        self.last_read = time.monotonic()
+        self.error = None
+        self.stopped = threading.Event()
+        threading.Thread(target=self.run, daemon=True).start()
+    
+    def touch(self):
+        self.last_read = time.monotonic()
+    
+    # Feeds shut themselves down once no viewer has read them for a while
+    def idle(self):
+        return time.monotonic() - self.last_read > LIVE_IDLE_SECONDS
+    
+    def run(self):
+        try:
+            self.stream()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.stopped.set()
+
+# Local random-walk stand-in for the upstream stream
+class SimulatedFeed(LiveFeed):
+    def stream(self):
+        rng = np.random.default_rng()
+        prices = dict.fromkeys(self.symbols, 100.0)
+        while not self.idle():
+            now = time.time()
+            for symbol in self.symbols:
+                prices[symbol] *= math.exp(rng.normal(0, 0.0005))
+                self.rings[symbol].append(now, prices[symbol])
+            time.sleep(SIMULATED_TICK_INTERVAL)
+
+# Finnhub trade stream over a websocket
+class FinnhubFeed(LiveFeed):
+    def __init__(self, symbols, api_key):
+        self.api_key = api_key
+        super().__init__(symbols)
+    
+    def stream(self):
+        ws = get_provider("finnhub").trade_stream(self.api_key)
+        try:
+            for symbol in self.symbols:
+                ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+            while not self.idle():
+                try:
+                    message = json.loads(ws.recv())
+                except websocket.WebSocketTimeoutException:
+                    continue
+                if message.get("type") != "trade":
+                    continue
+                for trade in message.get("data", []):
+                    ring = self.rings.get(trade.get("s"))
+                    if ring is not None:
+                        ring.append(trade["t"] / 1000, trade["p"])
+        finally:
+            ws.close()
+
+class TickerHub:
+    def __init__(self):
+        self.feeds = {}
+        self.lock = threading.Lock()
+    
+    # Viewers of the same symbols share one feed
+    def get(self, source, symbols, api_key):
+        key = (source, tuple(sorted(symbols)), key_scope(api_key))
+        with self.lock:
+            for stale in [k for k, feed in self.feeds.items() if feed.stopped.is_set() and k != key]:
+                del self.feeds[stale]
+            feed = self.feeds.get(key)
+            if feed is None or feed.stopped.is_set():
+                feed = FinnhubFeed(symbols, api_key) if source == "Finnhub" else SimulatedFeed(symbols)
+                self.feeds[key] = feed
+            feed.touch()
+            return feed
+
+@shared_resource()
+def get_ticker_hub():
+    return TickerHub()
+
+# Finnhub streaming needs the optional websocket-client package
+LIVE_SOURCES = (["Finnhub"] if websocket is not None else []) + ["Simulated"]
+
+# Paginated NewsAPI search. Articles are shown NEWS_PAGE_SIZE at a time from the
+# local index, which is filled NEWS_UPSTREAM_PAGE_SIZE at a time. NewsAPI quotas
+# count requests per day, so nothing is prefetched
+NEWS_PAGE_SIZE = 5
+NEWS_UPSTREAM_PAGE_SIZE = 20
+# Developer keys can't page past the first 100 results (NewsAPI answers 426)
+NEWS_MAX_RESULTS = 100
+# Upstream pages one `next_page` call may spend
+NEWS_MAX_UPSTREAM_PAGES = 2
+
+def fetch_news_page(api_key, query, page, since=None):
+    return get_provider("news").everything(api_key, query, page, NEWS_UPSTREAM_PAGE_SIZE, since)
+
+# Local full-text index of every article fetched, deduplicated by URL
+NEWS_DB_PATH = os.path.join(tempfile.gettempdir(), "chatbot_news.sqlite3")
+NEWS_FRESH_SECONDS = 60 * 60
+
+class NewsIndex:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    title TEXT,
+                    description TEXT,
+                    source TEXT,
+                    published_at TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+            # `topics` holds the queries that returned an article, since NewsAPI also
+            # matches on body text the index never sees in full
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(url UNINDEXED, title, description, content, topics)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    query TEXT PRIMARY KEY,
+                    fetched_at REAL NOT NULL,
+                    pages INTEGER NOT NULL,
+                    total_results INTEGER NOT NULL
+                )
+            """)
+    
+    def ingest(self, articles, query):
+        now = time.time()
+        topic = normalize_text(query)
+        with self.lock, self.conn:
+            for article in articles:
+                if not article.get("url"):
+                    continue
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                    (article["url"], article.get("title") or "", article.get("description") or "",
+                     (article.get("source") or {}).get("name") or "", article.get("publishedAt") or "", now)
+                )
+                if cursor.rowcount:
+                    self.conn.execute(
+                        "INSERT INTO articles_fts (url, title, description, content, topics) VALUES (?, ?, ?, ?, ?)",
+                        (article["url"], article.get("title") or "", article.get("description") or "",
+                         article.get("content") or "", topic)
+                    )
+                    continue
+                
+                row = self.conn.execute("SELECT topics FROM articles_fts WHERE url = ?", (article["url"],)).fetchone()
+                if row and topic not in row[0].split("\n"):
+                    self.conn.execute(
+                        "UPDATE articles_fts SET topics = ? WHERE url = ?", (f"{row[0]}\n{topic}", article["url"])
+                    )
+    
+    # Upstream searches are recorded per query and `from` date, since their paging differs
+    def _search_key(self, query, since):
+        return f"{normalize_text(query)}@{since}" if since else normalize_text(query)
+    
+    def record_search(self, query, pages, total_results, since=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                (self._search_key(query, since), time.time(), pages, total_results)
+            )
+    
+    # (fetched_at, pages, total_results) of the last upstream search for a query
+    def search_record(self, query, since=None):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT fetched_at, pages, total_results FROM searches WHERE query = ?", (self._search_key(query, since),)
+            ).fetchone()
+    
+    def _where(self, query, since):
+        terms = normalize_text(query).split()
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        return "articles_fts MATCH ? AND a.published_at >= ?", (match, since or "")
+    
+    def search(self, query, since=None, newest_first=False, limit=10, offset=0):
+        if not normalize_text(query):
+            return []
+        where, params = self._where(query, since)
+        order = "a.published_at DESC" if newest_first else "bm25(articles_fts)"
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT a.url, a.title, a.description, a.source, a.published_at FROM articles_fts "
+                f"JOIN articles a ON a.url = articles_fts.url WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return [
+            {"url": url, "title": title, "description": description, "source": {"name": source}, "publishedAt": published_at}
+            for url, title, description, source, published_at in rows
+        ]
+    
+    def count(self, query, since=None):
+        if not normalize_text(query):
+            return 0
+        where, params = self._where(query, since)
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM articles_fts JOIN articles a ON a.url = articles_fts.url WHERE {where}", params
+            ).fetchone()[0]
+
+@shared_resource()
+def get_news_index():
+    return NewsIndex(NEWS_DB_PATH)
+
+# A news search served from the local index, going upstream to NewsAPI when the
+# query has not been fetched recently or the index runs short. Upstream paging is
+# reused if the query was fetched recently
+class NewsSearch:
+    def __init__(self, query, days=None, newest_first=False):
+        self.query = query
+        self.since = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%SZ') if days else None
+        # NewsAPI filters on `from` too, at day resolution so the search record is reusable
+        self.upstream_since = self.since[:10] if self.since else None
+        self.newest_first = newest_first
+        self.shown = 0
+        self.has_more = False
+        self.error = None
+        record = get_news_index().search_record(query, self.upstream_since)
+        self.stale = not (record and time.time() - record[0] < NEWS_FRESH_SECONDS)
+        if self.stale:
+            self.page, self.total = 0, None
+        else:
+            self.page, self.total = record[1], record[2]
+    
+    def upstream_has_more(self):
+        return self.total is None or self.page * NEWS_UPSTREAM_PAGE_SIZE < min(self.total, NEWS_MAX_RESULTS)
+    
+    # Fetch the next NewsAPI page into the index
+    def fetch_upstream(self, api_key):
+        page = self.page + 1
+        data = fetch_news_page(api_key, self.query, page, self.upstream_since)
+        articles = data.get("articles", [])
+        get_news_index().ingest(articles, self.query)
+        retrieval_index = get_retrieval_index()
+        for article in articles:
+            if article.get("url"):
+                add_article_snippets(retrieval_index, key_scope(api_key), article)
+        self.page = page
+        self.total = data.get("totalResults", 0)
+        self.stale = False
+        get_news_index().record_search(self.query, page, self.total, self.upstream_since)
+    
+    # The next `limit` articles, spending at most NEWS_MAX_UPSTREAM_PAGES upstream.
+    # An upstream failure is kept in `error` and the page is served from whatever
+    # the index already holds
+    def next_page(self, api_key, limit=NEWS_PAGE_SIZE):
+        index = get_news_index()
+        self.error = None
+        fetched = 0
+        while (self.stale or index.count(self.query, self.since) < self.shown + limit) and self.upstream_has_more():
+            if fetched == NEWS_MAX_UPSTREAM_PAGES:
+                break
+            fetched += 1
+            try:
+                self.fetch_upstream(api_key)
+            except Exception as e:
+                self.error = str(e)
+                break
+        
+        articles = index.search(self.query, self.since, self.newest_first, limit, self.shown)
+        self.shown += len(articles)
+        self.has_more = index.count(self.query, self.since) > self.shown or self.upstream_has_more()
+        return articles
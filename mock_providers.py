@@ -0,0 +1,521 @@
+# Local stand-ins for the upstream providers, for benchmarking and working offline.
+# One server answers for all of them under a path prefix per provider, so pointing
+# the app at it is a matter of setting the <NAME>_BASE_URL variables it prints:
+#   python mock_providers.py --port 8900 --latency 0.05 --latency openai=0.4 --error-rate 0.01
+# Responses are replayed from --recordings when a recorded one matches the request,
+# and synthesized deterministically from the request otherwise. With --record the
+# server forwards to the real provider instead and saves what comes back
+import argparse
+import base64
+import datetime
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from PIL import Image
+import requests
+
+# Same names and upstreams as the adapters in core.py
+PROVIDER_UPSTREAMS = {
+    "openai": "https://api.openai.com/v1",
+    "together": "https://api.together.xyz/v1",
+    "pexels": "https://api.pexels.com",
+    "finnhub": "https://finnhub.io/api/v1",
+    "twelve": "https://api.twelvedata.com",
+    "coinapi": "https://rest.coinapi.io/v1",
+    "news": "https://newsapi.org/v2",
+}
+# Left out of recording keys and never written to disk
+SECRET_PARAMS = {"token", "apikey", "apiKey"}
+FORWARDED_HEADERS = ["Authorization", "X-CoinAPI-Key", "Content-Type"]
+
+# Environment for pointing core.py's adapters at a mock server
+def mock_base_urls(url):
+    return {f"{name.upper()}_BASE_URL": f"{url.rstrip('/')}/{name}" for name in PROVIDER_UPSTREAMS}
+
+# Server settings. Per-provider values use `provider=value` and override the default
+class MockSettings:
+    def __init__(self, latency=None, jitter=0.0, error_rate=None, error_status=503,
+                 chunk_delay=0.02, answer_words=60, video_bytes=256 * 1024, recordings=None, record=False):
+        self.latency = latency or {"*": 0.0}
+        self.jitter = jitter
+        self.error_rate = error_rate or {"*": 0.0}
+        self.error_status = error_status
+        self.chunk_delay = chunk_delay
+        self.answer_words = answer_words
+        self.video_bytes = video_bytes
+        self.recordings = recordings
+        self.record = record
+    
+    def delay(self, provider):
+        latency = self.latency.get(provider, self.latency.get("*", 0.0))
+        return max(latency + random.uniform(-self.jitter, self.jitter), 0.0)
+    
+    def fails(self, provider):
+        return random.random() < self.error_rate.get(provider, self.error_rate.get("*", 0.0))
+
+def per_provider(values):
+    settings = {}
+    for value in values or []:
+        provider, _, number = value.rpartition("=")
+        if provider and provider not in PROVIDER_UPSTREAMS:
+            raise argparse.ArgumentTypeError(f"Unknown provider: {provider}")
+        settings[provider or "*"] = float(number)
+    return settings
+
+def add_mock_arguments(parser):
+    parser.add_argument("--latency", action="append", metavar="[PROVIDER=]SECONDS",
+                        help="Added response latency, default 0; repeat for per-provider values")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", action="append", metavar="[PROVIDER=]RATE",
+                        help="Fraction of requests that fail, default 0; repeat for per-provider values")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code of injected failures")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument("--answer-words", type=int, default=60, help="Length of synthesized chat answers")
+    parser.add_argument("--video-bytes", type=int, default=256 * 1024, help="Size of synthesized video files")
+    parser.add_argument("--recordings", help="Directory of recorded responses to replay (or record into)")
+    parser.add_argument("--record", action="store_true", help="Forward to the real providers and record responses")
+
+def mock_settings(args):
+    if args.record and not args.recordings:
+        raise SystemExit("--record needs --recordings")
+    return MockSettings(
+        latency=per_provider(args.latency),
+        jitter=args.jitter,
+        error_rate=per_provider(args.error_rate),
+        error_status=args.error_status,
+        chunk_delay=args.chunk_delay,
+        answer_words=args.answer_words,
+        video_bytes=args.video_bytes,
+        recordings=args.recordings,
+        record=args.record
+    )
+
+# A response: `body` is bytes, or an iterable of chunks for a streamed response
+class MockResponse:
+    def __init__(self, status, content_type, body):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+def json_response(data, status=200):
+    return MockResponse(status, "application/json", json.dumps(data).encode())
+
+# Deterministic randomness, so repeated and overlapping requests agree
+def seeded(*parts):
+    return random.Random(zlib.crc32("|".join(str(p) for p in parts).encode()))
+
+def base_price(symbol):
+    return 20 + seeded("price", symbol).random() * 480
+
+# Smooth drift plus per-bar noise as a function of time alone, so bars fetched in
+# different requests line up the way the incremental price store expects
+def price_at(symbol, timestamp):
+    base = base_price(symbol)
+    days = timestamp / 86400
+    drift = 0.08 * math.sin(days / 29) + 0.03 * math.sin(days / 3.7)
+    noise = (zlib.crc32(f"{symbol}|{int(timestamp)}".encode()) % 2000 / 1000 - 1) * 0.004
+    return base * (1 + drift + noise)
+
+def bar_at(symbol, timestamp, seconds):
+    open_price = price_at(symbol, timestamp)
+    close_price = price_at(symbol, timestamp + seconds)
+    spread = abs(close_price - open_price) + open_price * 0.002
+    volume = 1000 + zlib.crc32(f"v|{symbol}|{int(timestamp)}".encode()) % 100000
+    return open_price, max(open_price, close_price) + spread / 2, min(open_price, close_price) - spread / 2, close_price, volume
+
+def bar_times(start, end, seconds, limit):
+    first = math.ceil(start.timestamp() / seconds) * seconds
+    last = min(end.timestamp(), time.time())
+    count = max(min(int((last - first) // seconds) + 1, limit), 0)
+    return [first + i * seconds for i in range(count)]
+
+def parse_time(value, default):
+    if not value:
+        return default
+    return datetime.datetime.fromisoformat(value.replace("Z", ""))
+
+# OpenAI: streamed or whole chat completions answering the last message
+def chat_completion(settings, params, body):
+    request = json.loads(body or b"{}")
+    messages = request.get("messages") or [{"content": ""}]
+    question = messages[-1].get("content") or ""
+    rng = seeded("chat", question)
+    words = ["Mock", "answer", "to:"] + question.split()[:12]
+    vocabulary = "the market data news price trend model answer result signal volume report".split()
+    words += [rng.choice(vocabulary) for _ in range(max(settings.answer_words - len(words), 0))]
+    completion_id = f"chatcmpl-mock{rng.randrange(10 ** 8)}"
+    created = int(time.time())
+    model = request.get("model", "mock")
+    
+    if not request.get("stream"):
+        return json_response({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)}
+        })
+    
+    def chunk(delta, finish_reason=None):
+        data = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(data)}\n\n".encode()
+    
+    def events():
+        yield chunk({"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            yield chunk({"content": word if i == 0 else f" {word}"})
+        yield chunk({}, "stop")
+        yield b"data: [DONE]\n\n"
+    return MockResponse(200, "text/event-stream", events())
+
+# Together.ai: a flat-colored PNG of the requested size
+def image_generation(settings, params, body):
+    request = json.loads(body or b"{}")
+    rng = seeded("image", request.get("prompt"), request.get("seed"))
+    color = tuple(rng.randrange(256) for _ in range(3))
+    image = Image.new("RGB", (int(request.get("width", 1024)), int(request.get("height", 1024))), color)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return json_response({"data": [{"b64_json": base64.b64encode(buf.getvalue()).decode()}]})
+
+# Pexels: video search pages whose files are served by this server
+PEXELS_TOTAL_RESULTS = 60
+VIDEO_SIZES = [(640, 360), (960, 540), (1280, 720), (1920, 1080)]
+
+def video_search(settings, params, body, host):
+    query = params.get("query", "")
+    page = int(params.get("page", 1))
+    per_page = int(params.get("per_page", 15))
+    first = (page - 1) * per_page
+    videos = []
+    for n in range(first, min(first + per_page, PEXELS_TOTAL_RESULTS)):
+        video_id = zlib.crc32(f"{query}|{n}".encode())
+        rng = seeded("video", video_id)
+        videos.append({
+            "id": video_id,
+            "duration": rng.randrange(5, 120),
+            "image": f"http://{host}/pexels/media/{video_id}.jpg",
+            "user": {"name": f"Mock Creator {rng.randrange(100)}"},
+            "video_files": [
+                {"id": video_id * 10 + i, "file_type": "video/mp4", "width": width, "height": height, "fps": 30,
+                 "link": f"http://{host}/pexels/media/{video_id}_{height}.mp4"}
+                for i, (width, height) in enumerate(VIDEO_SIZES)
+            ]
+        })
+    data = {"page": page, "per_page": per_page, "total_results": PEXELS_TOTAL_RESULTS, "videos": videos}
+    if first + per_page < PEXELS_TOTAL_RESULTS:
+        data["next_page"] = f"http://{host}/pexels/videos/search?query={query}&page={page + 1}&per_page={per_page}"
+    return json_response(data)
+
+def video_media(settings, params, body, name, extension):
+    if extension == "jpg":
+        buf = io.BytesIO()
+        Image.new("RGB", (320, 180), tuple(seeded("thumb", name).randrange(256) for _ in range(3))).save(buf, format="JPEG")
+        return MockResponse(200, "image/jpeg", buf.getvalue())
+    return MockResponse(200, "video/mp4", seeded("media", name).randbytes(settings.video_bytes))
+
+# Finnhub: company profile and latest quote
+def stock_profile(settings, params, body):
+    symbol = params.get("symbol", "")
+    rng = seeded("profile", symbol)
+    return json_response({
+        "name": f"{symbol} Holdings", "ticker": symbol, "exchange": "NASDAQ NMS - GLOBAL MARKET",
+        "country": "US", "currency": "USD", "finnhubIndustry": rng.choice(["Technology", "Retail", "Media", "Banking"]),
+        "marketCapitalization": round(rng.uniform(1e3, 3e6), 2), "ipo": "1999-01-01", "logo": "", "weburl": ""
+    })
+
+def stock_quote(settings, params, body):
+    symbol = params.get("symbol", "")
+    now = time.time()
+    close = price_at(symbol, now)
+    previous = price_at(symbol, now - 86400)
+    return json_response({
+        "c": round(close, 2), "d": round(close - previous, 2), "dp": round((close / previous - 1) * 100, 4),
+        "h": round(max(close, previous) * 1.01, 2), "l": round(min(close, previous) * 0.99, 2),
+        "o": round(previous, 2), "pc": round(previous, 2), "t": int(now)
+    })
+
+# Twelve Data: newest-first bars per symbol, keyed by symbol for multi-symbol requests
+TWELVE_INTERVALS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "1h": 3600, "1day": 86400}
+TWELVE_MAX_BARS = 5000
+
+def time_series(settings, params, body):
+    interval = params.get("interval", "1day")
+    if interval not in TWELVE_INTERVALS:
+        return json_response({"code": 400, "message": f"Unsupported interval {interval}", "status": "error"})
+    seconds = TWELVE_INTERVALS[interval]
+    end = parse_time(params.get("end_date"), datetime.datetime.now())
+    if params.get("start_date"):
+        start = parse_time(params["start_date"], end)
+        limit = TWELVE_MAX_BARS
+    else:
+        limit = int(params.get("outputsize", 30))
+        start = end - datetime.timedelta(seconds=seconds * limit)
+    time_format = "%Y-%m-%d" if interval == "1day" else "%Y-%m-%d %H:%M:%S"
+    
+    series = {}
+    symbols = [s for s in params.get("symbol", "").split(",") if s]
+    for symbol in symbols:
+        # Like Twelve Data, unknown symbols fail inside an HTTP 200 body
+        if symbol.startswith("BAD"):
+            series[symbol] = {"code": 404, "message": f"**symbol** not found: {symbol}", "status": "error"}
+            continue
+        values = []
+        for timestamp in reversed(bar_times(start, end, seconds, limit)):
+            open_price, high, low, close, volume = bar_at(symbol, timestamp, seconds)
+            values.append({
+                "datetime": datetime.datetime.fromtimestamp(timestamp).strftime(time_format),
+                "open": f"{open_price:.5f}", "high": f"{high:.5f}", "low": f"{low:.5f}",
+                "close": f"{close:.5f}", "volume": str(volume)
+            })
+        series[symbol] = {"meta": {"symbol": symbol, "interval": interval}, "values": values, "status": "ok"}
+    return json_response(series[symbols[0]] if len(symbols) == 1 else series)
+
+# CoinAPI: exchange rate and oldest-first OHLCV history
+COINAPI_PERIODS = {"1MIN": 60, "5MIN": 300, "15MIN": 900, "1HRS": 3600, "1DAY": 86400}
+
+def exchange_rate(settings, params, body, symbol):
+    return json_response({
+        "time": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+        "asset_id_base": symbol, "asset_id_quote": "USD", "rate": price_at(f"crypto|{symbol}", time.time())
+    })
+
+def ohlcv_history(settings, params, body, symbol):
+    period = params.get("period_id", "1DAY")
+    if period not in COINAPI_PERIODS:
+        return json_response({"error": f"Unsupported period_id {period}"}, 400)
+    seconds = COINAPI_PERIODS[period]
+    end = parse_time(params.get("time_end"), datetime.datetime.now())
+    start = parse_time(params.get("time_start"), end - datetime.timedelta(days=30))
+    records = []
+    for timestamp in bar_times(start, end, seconds, int(params.get("limit", 100))):
+        open_price, high, low, close, volume = bar_at(f"crypto|{symbol}", timestamp, seconds)
+        bar_start = datetime.datetime.fromtimestamp(timestamp)
+        records.append({
+            "time_period_start": bar_start.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+            "time_period_end": (bar_start + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+            "price_open": open_price, "price_high": high, "price_low": low, "price_close": close,
+            "volume_traded": volume, "trades_count": volume // 10
+        })
+    return json_response(records)
+
+# NewsAPI: pages of articles that mention the query. As with a developer key, only
+# the first 100 results can be paged to, whatever totalResults says
+NEWS_TOTAL_RESULTS = 250
+NEWS_MAX_RESULTS = 100
+
+def everything(settings, params, body):
+    query = params.get("q", "")
+    page = int(params.get("page", 1))
+    page_size = int(params.get("pageSize", 20))
+    # Article n is about 3n hours old, so `from` cuts the result set short
+    total = NEWS_TOTAL_RESULTS
+    if params.get("from"):
+        hours = (datetime.datetime.utcnow() - parse_time(params["from"], None)).total_seconds() / 3600
+        total = min(total, max(int(hours // 3), 0))
+    if (page - 1) * page_size >= NEWS_MAX_RESULTS:
+        return json_response({
+            "status": "error", "code": "maximumResultsReached",
+            "message": f"Developer accounts are limited to a max of {NEWS_MAX_RESULTS} results."
+        }, 426)
+    articles = []
+    for n in range((page - 1) * page_size, min(page * page_size, total, NEWS_MAX_RESULTS)):
+        rng = seeded("news", query, n)
+        published = datetime.datetime.utcnow() - datetime.timedelta(hours=n * 3 + rng.randrange(3))
+        articles.append({
+            "source": {"id": None, "name": f"Mock Wire {rng.randrange(20)}"},
+            "author": "Mock Reporter",
+            "title": f"{query.title()} update #{n + 1}: what changed this week",
+            "description": f"A synthesized report on {query}, number {n + 1} of {NEWS_TOTAL_RESULTS}.",
+            "url": f"https://news.example.com/{zlib.crc32(query.encode())}/{n}",
+            "urlToImage": None,
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "content": f"{query} " * 20
+        })
+    return json_response({"status": "ok", "totalResults": total, "articles": articles})
+
+# (method, provider, path pattern, handler); handlers get the settings, the query
+# params, the request body and any path groups
+ROUTES = [
+    ("POST", "openai", r"/chat/completions", chat_completion),
+    ("POST", "together", r"/images/generations", image_generation),
+    ("GET", "pexels", r"/videos/search", video_search),
+    ("GET", "pexels", r"/media/(\w+)\.(mp4|jpg)", video_media),
+    ("GET", "finnhub", r"/stock/profile2", stock_profile),
+    ("GET", "finnhub", r"/quote", stock_quote),
+    ("GET", "twelve", r"/time_series", time_series),
+    ("GET", "coinapi", r"/exchangerate/([^/]+)/USD", exchange_rate),
+    ("GET", "coinapi", r"/ohlcv/([^/]+)/USD/history", ohlcv_history),
+    ("GET", "news", r"/everything", everything),
+]
+
+# Recorded responses, one JSON file per request under <dir>/<provider>/
+class Recordings:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+    
+    def key(self, method, provider, path, params, body):
+        normalized = sorted((name, value) for name, value in params.items() if name not in SECRET_PARAMS)
+        digest = hashlib.sha256(json.dumps([method, path, normalized]).encode() + (body or b"")).hexdigest()[:32]
+        return os.path.join(self.path, provider, f"{digest}.json")
+    
+    def load(self, key):
+        if not os.path.exists(key):
+            return None
+        with open(key) as f:
+            record = json.load(f)
+        body = base64.b64decode(record["base64"]) if "base64" in record else record["text"].encode()
+        if record["content_type"].startswith("text/event-stream"):
+            # Replay the stream event by event so chunk timing still applies
+            body = [event + b"\n\n" for event in body.split(b"\n\n") if event]
+        return MockResponse(record["status"], record["content_type"], body)
+    
+    def save(self, key, response):
+        record = {"status": response.status, "content_type": response.content_type}
+        if response.content_type.startswith(("application/json", "text/")):
+            record["text"] = response.body.decode()
+        else:
+            record["base64"] = base64.b64encode(response.body).decode()
+        with self.lock:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            with open(key, "w") as f:
+                json.dump(record, f)
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        self.handle_request("GET")
+    
+    def do_POST(self):
+        self.handle_request("POST")
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def handle_request(self, method):
+        settings = self.server.settings
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if url.path == "/health":
+            return self.send(json_response({"status": "ok"}))
+        provider, _, rest = url.path.lstrip("/").partition("/")
+        if provider not in PROVIDER_UPSTREAMS:
+            return self.send(json_response({"error": f"Unknown provider: {provider}"}, 404))
+        rest = f"/{rest}"
+        
+        time.sleep(settings.delay(provider))
+        if settings.fails(provider):
+            return self.send(json_response({"error": "Injected mock failure"}, settings.error_status))
+        
+        recordings = self.server.recordings
+        key = recordings.key(method, provider, rest, params, body) if recordings else None
+        if settings.record:
+            response = self.forward(method, provider, rest, url.query, body)
+            if response.status == 200:
+                recordings.save(key, response)
+            return self.send(response)
+        response = recordings.load(key) if recordings else None
+        if response is None:
+            response = self.synthesize(method, provider, rest, params, body)
+        self.send(response)
+    
+    def synthesize(self, method, provider, path, params, body):
+        for route_method, route_provider, pattern, handler in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and route_provider == provider and match:
+                extra = match.groups()
+                if handler is video_search:
+                    extra = (self.headers.get("Host"),)
+                return handler(self.server.settings, params, body, *extra)
+        return json_response({"error": f"No mock for {method} {provider}{path}"}, 404)
+    
+    def forward(self, method, provider, path, query, body):
+        headers = {name: self.headers[name] for name in FORWARDED_HEADERS if self.headers.get(name)}
+        upstream = requests.request(
+            method,
+            f"{PROVIDER_UPSTREAMS[provider]}{path}" + (f"?{query}" if query else ""),
+            headers=headers,
+            data=body or None,
+            timeout=(5, 180)
+        )
+        content_type = upstream.headers.get("Content-Type", "application/octet-stream")
+        return MockResponse(upstream.status_code, content_type, upstream.content)
+    
+    def send(self, response):
+        self.send_response(response.status)
+        self.send_header("Content-Type", response.content_type)
+        if isinstance(response.body, bytes):
+            self.send_header("Content-Length", str(len(response.body)))
+            self.end_headers()
+            self.wfile.write(response.body)
+            return
+        
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for i, chunk in enumerate(response.body):
+            if i:
+                time.sleep(self.server.settings.chunk_delay)
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, settings, verbose=False):
+        super().__init__(address, MockHandler)
+        self.settings = settings
+        self.recordings = Recordings(settings.recordings) if settings.recordings else None
+        self.verbose = verbose
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+# Serve in a background thread; used by in-process harnesses
+def start_mock_server(settings, host="127.0.0.1", port=0):
+    server = MockServer((host, port), settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Serve until interrupted; also the target when a harness runs the server in its own process
+def serve_mock(settings, host, port, verbose=False):
+    server = MockServer((host, port), settings, verbose=verbose)
+    for name, value in mock_base_urls(server.url).items():
+        print(f"export {name}={value}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the app's upstream providers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    
+    serve_mock(mock_settings(args), args.host, args.port, args.verbose)
+
+if __name__ == "__main__":
+    main()